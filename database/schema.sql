@@ -19,3 +19,27 @@ CREATE TABLE IF NOT EXISTS keep_alive (
     id SERIAL PRIMARY KEY,
     last_run TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
+
+-- Optional per-run send ledger, written in bulk by `send_menu.py --ledger-supabase`
+-- so a crashed or sharded send can resume without emailing anyone twice.
+CREATE TABLE IF NOT EXISTS send_ledger (
+    send_date DATE NOT NULL,
+    run_kind TEXT NOT NULL DEFAULT 'daily',
+    email TEXT NOT NULL,
+    status TEXT NOT NULL CHECK (status IN ('delivered', 'failed', 'skipped')),
+    detail TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (send_date, run_kind, email)
+);
+
+-- Optional per-station menu hashes of the last send, written by
+-- `send_menu.py --state-supabase` so `--update` can diff against them from any runner.
+CREATE TABLE IF NOT EXISTS menu_state (
+    menu_date DATE NOT NULL,
+    meal TEXT NOT NULL,
+    station TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    item_names JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (menu_date, meal, station)
+);
@@ -1,40 +1,179 @@
-import os
 import argparse
 import datetime
-from typing import List, Dict, Any
-from dotenv import load_dotenv
-from supabase import create_client, Client
+import hashlib
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
+from services.config import bootstrap, create_supabase_client
 from services.utils import (
-    fetch_menu_data,
-    parse_menu,
-    filter_menu_for_user,
+    fetch_menu_range,
+    prewarm_menu_weeks,
     find_watchlist_hits,
-    sort_menu_items,
+    get_watchlist_terms,
+    MenuIndex,
+    MenuRange,
+    WatchlistIndex,
+)
+from services.email_sender import MessageTemplate, SpoolSender, get_smtp_settings
+from services.email_templates import GMAIL_CLIP_BYTES, TOKEN_PLACEHOLDER, FragmentCache, generate_html_email
+from services.menu_cache import is_cache_dir_configured
+from services.delivery import DeliveryStage, RateLimiter, get_daily_quota
+from services.ledger import STATUS_SKIPPED, SendLedger, get_ledger_path
+from services.menu_archive import archive_menu_items
+from services.menu_state import MenuStateStore, baseline_items, diff_menu_state, fingerprint, get_state_path, station_hashes
+from services.metrics import (
+    RunMetrics,
+    StageTimer,
+    get_profile_path,
+    get_run_metrics,
+    run_profiled,
+    start_run_metrics,
+    write_run_metrics,
 )
-from services.email_templates import generate_html_email
-from services.email_sender import send_email
-
-# Load environment variables
-load_dotenv()
 
-# Configure Logging
 import logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_users(supabase: Client, target_email: str = None):
-    """Fetch users from Supabase. Optionally filter by a specific email."""
-    query = supabase.table("users").select("*").eq("is_active", True)
-    
+# The Supabase SDK is slow to import; it is loaded by create_supabase_client when needed.
+if TYPE_CHECKING:
+    from supabase import Client
+
+MAX_DAYS_AHEAD = 2
+# Only the columns the sender reads; keeps pages small as the users table grows.
+USER_COLUMNS = "email,token,preferences"
+USER_PAGE_SIZE = 1000
+_EXHAUSTED = object()
+
+def _build_users_query(supabase: "Client", target_email: str = None):
+    query = supabase.table("users").select(USER_COLUMNS).eq("is_active", True)
+
     if target_email:
         # If targeting a specific user, we might want to ignore is_active=True 
         # allowing us to test even with inactive users, or keep it strict.
         # Let's keep it strict for the main script, but log it.
-        logging.info(f"Fetching data for specific user: {target_email}")
         query = query.eq("email", target_email)
-        
-    response = query.execute()
-    return response.data
+
+    return query
+
+def iter_user_pages(supabase: "Client", target_email: str = None, page_size: int = USER_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields active users a page at a time, fetching only USER_COLUMNS.
+    Uses keyset pagination on email so later pages cost the same as the first.
+    """
+    last_email = None
+    while True:
+        query = _build_users_query(supabase, target_email)
+        if last_email is not None:
+            query = query.gt("email", last_email)
+
+        with get_run_metrics().observe_time("supabase_query_seconds"):
+            rows = query.order("email").limit(page_size).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+
+        last_email = rows[-1]["email"]
+
+def stream_users(
+    supabase: "Client",
+    target_email: str = None,
+    page_size: int = USER_PAGE_SIZE,
+    prefetch_pages: int = 2,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Returns an iterator of users while a background thread fetches the next pages,
+    so Supabase paging overlaps with rendering and sending.
+    At most `prefetch_pages` pages are held in memory ahead of the consumer.
+    """
+    if target_email:
+        logging.info(f"Fetching data for specific user: {target_email}")
+
+    pages: queue.Queue = queue.Queue(maxsize=max(1, prefetch_pages))
+    done = object()
+    stop = threading.Event()
+
+    def fetch_pages():
+        try:
+            for page in iter_user_pages(supabase, target_email, page_size):
+                while not stop.is_set():
+                    try:
+                        pages.put(page, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            pages.put(done)
+        except Exception as e:
+            pages.put(e)
+
+    def drain_pages():
+        try:
+            while True:
+                page = pages.get()
+                if page is done:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield from page
+        finally:
+            stop.set()
+
+    # Start paging now rather than on first next(), so it overlaps the menu fetch.
+    threading.Thread(target=fetch_pages, name="user-pages", daemon=True).start()
+    return drain_pages()
+
+def get_users(supabase: "Client", target_email: str = None):
+    """Fetch users from Supabase. Optionally filter by a specific email."""
+    return list(stream_users(supabase, target_email))
+
+def send_heartbeat(supabase: "Client") -> None:
+    """Upsert the keep_alive row so the Supabase project is not paused."""
+    try:
+        logging.info("Sending heartbeat to keep_alive table...")
+        # Upsert a row with id=1, updating the last_run timestamp
+        with get_run_metrics().observe_time("supabase_query_seconds"):
+            supabase.table("keep_alive").upsert({"id": 1, "last_run": datetime.datetime.now(datetime.timezone.utc).isoformat()}).execute()
+        logging.info("Heartbeat sent successfully.")
+    except Exception as e:
+        logging.error(f"Failed to send heartbeat: {e}")
+
+def save_menu_state(state_path: Path, menu_state: Dict[Any, Any], supabase: Optional["Client"] = None) -> None:
+    """Store the sent menu as the --update baseline; failures are logged, never fatal to the send."""
+    try:
+        with MenuStateStore(state_path, supabase=supabase) as store:
+            store.save(menu_state)
+    except (sqlite3.Error, OSError) as e:
+        logging.error(f"Failed to store menu state in {state_path}: {e}")
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parses an "i/N" shard spec (0-based index i of N shards) for --shard.
+    """
+    try:
+        index_text, count_text = value.split("/", 1)
+        shard_index, shard_count = int(index_text), int(count_text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/N, got {value!r}.")
+
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 0 and {shard_count - 1}.")
+
+    return shard_index, shard_count
+
+def get_user_shard(email: str, shard_count: int) -> int:
+    """
+    Stable shard assignment from a hash of the normalized email.
+    Every process computes the same split, so no user is sent twice or skipped.
+    """
+    digest = hashlib.sha1(email.strip().lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
 
 def get_days_ahead(preferences: Dict[str, Any]) -> int:
     try:
@@ -42,32 +181,231 @@ def get_days_ahead(preferences: Dict[str, Any]) -> int:
     except (TypeError, ValueError):
         days_ahead = 1
 
-    return max(1, min(days_ahead, 2))
+    return max(1, min(days_ahead, MAX_DAYS_AHEAD))
 
-def main():
+def get_preferences_key(preferences: Dict[str, Any]) -> str:
+    """
+    Canonical hash of every preference that shapes a digest.
+    Users with the same key receive identical emails apart from their token links.
+    """
+    canonical = {
+        "meals": sorted({meal.lower() for meal in preferences.get("meals", []) if isinstance(meal, str)}),
+        "stations": sorted({station.lower() for station in preferences.get("stations", []) if isinstance(station, str)}),
+        "days_ahead": get_days_ahead(preferences),
+        "watchlist": sorted(get_watchlist_terms(preferences)),
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+def build_digest(
+    menu_index: MenuIndex,
+    start_date: datetime.date,
+    preferences: Dict[str, Any],
+    watchlist_indexes: Optional[Dict[int, WatchlistIndex]] = None,
+    timer: Optional[StageTimer] = None,
+):
+    """
+    Returns (digest, watchlist_hits, days_ahead) for one set of preferences.
+    The digest is a MenuDigest selected from `menu_index` buckets, already grouped and ordered.
+    `watchlist_indexes` memoizes one WatchlistIndex per window length across calls.
+    """
+    timer = timer or StageTimer()
+    days_ahead = get_days_ahead(preferences)
+    window = tuple(
+        (start_date + datetime.timedelta(days=offset)).isoformat()
+        for offset in range(days_ahead)
+    )
+    with timer.time("filtering"):
+        digest = menu_index.select_for_user(window, preferences)
+
+    with timer.time("watchlist"):
+        if watchlist_indexes is None:
+            watchlist_indexes = {}
+        watchlist_index = watchlist_indexes.get(days_ahead)
+        if watchlist_index is None and get_watchlist_terms(preferences):
+            watchlist_index = WatchlistIndex(menu_index.window_items(window))
+            watchlist_indexes[days_ahead] = watchlist_index
+
+        watchlist_hits = []
+        if watchlist_index is not None:
+            watchlist_hits = find_watchlist_hits(watchlist_index.items, preferences, index=watchlist_index)
+    return digest, watchlist_hits, days_ahead
+
+def _timed_iter(iterable, timer: StageTimer, stage: str):
+    """Yields from `iterable`, charging the time spent waiting on it to `stage`."""
+    iterator = iter(iterable)
+    while True:
+        with timer.time(stage):
+            item = next(iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+def get_subject(start_date: datetime.date, days_ahead: int) -> str:
+    if days_ahead == 1:
+        return f"Dickinson Daily Menu - {start_date.strftime('%b %d')}"
+
+    end_date = start_date + datetime.timedelta(days=days_ahead - 1)
+    return f"Dickinson Daily Menu - {start_date.strftime('%b %d')} to {end_date.strftime('%b %d')}"
+
+class CohortRenderer:
+    """
+    Renders one email body per distinct preference set (see get_preferences_key),
+    on first use, so users can be streamed in any order. Each body is MIME-encoded
+    once as a MessageTemplate from `from_email`.
+    With `previous_index` (the menu as last sent), cohorts whose digest and watchlist
+    hits are unchanged are marked changed=False and not rendered.
+    """
+
+    def __init__(
+        self,
+        menu_index: MenuIndex,
+        start_date: datetime.date,
+        timer: Optional[StageTimer] = None,
+        from_email: Optional[str] = None,
+        previous_index: Optional[MenuIndex] = None,
+        subject_prefix: str = "",
+    ):
+        self.menu_index = menu_index
+        self.start_date = start_date
+        self.timer = timer or StageTimer()
+        self.from_email = from_email
+        self.previous_index = previous_index
+        self.subject_prefix = subject_prefix
+        self.fragment_cache = FragmentCache()
+        self.watchlist_indexes: Dict[int, WatchlistIndex] = {}
+        self.previous_watchlist_indexes: Dict[int, WatchlistIndex] = {}
+        self.cohorts: Dict[str, Dict[str, Any]] = {}
+
+    def render(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the cohort for `preferences`: html and message (None when there is
+        nothing to send), subject, days_ahead, changed and the digest/watchlist counts.
+        """
+        key = get_preferences_key(preferences)
+        cohort = self.cohorts.get(key)
+        if cohort is not None:
+            return cohort
+
+        digest, watchlist_hits, days_ahead = build_digest(
+            self.menu_index,
+            self.start_date,
+            preferences,
+            self.watchlist_indexes,
+            self.timer,
+        )
+        changed = True
+        if self.previous_index is not None:
+            previous_digest, previous_hits, _ = build_digest(
+                self.previous_index,
+                self.start_date,
+                preferences,
+                self.previous_watchlist_indexes,
+                self.timer,
+            )
+            changed = list(digest) != list(previous_digest) or watchlist_hits != previous_hits
+
+        subject = self.subject_prefix + get_subject(self.start_date, days_ahead)
+        html_template = None
+        message = None
+        if changed and (digest or watchlist_hits):
+            with self.timer.time("rendering"):
+                html_template = generate_html_email(
+                    digest,
+                    TOKEN_PLACEHOLDER,
+                    self.start_date,
+                    days_ahead,
+                    watchlist_hits=watchlist_hits,
+                    fragment_cache=self.fragment_cache,
+                )
+            html_bytes = len(html_template.encode("utf-8"))
+            if html_bytes > GMAIL_CLIP_BYTES:
+                logging.warning(
+                    "A %s-day digest with %s items renders to %.0f KB; Gmail will clip it.",
+                    days_ahead,
+                    len(digest),
+                    html_bytes / 1024,
+                )
+            with self.timer.time("mime encoding"):
+                message = MessageTemplate(self.from_email, subject, html_template, TOKEN_PLACEHOLDER)
+
+        cohort = {
+            "html": html_template,
+            "message": message,
+            "subject": subject,
+            "days_ahead": days_ahead,
+            "changed": changed,
+            "digest_count": len(digest),
+            "watchlist_count": len(watchlist_hits),
+        }
+        self.cohorts[key] = cohort
+        return cohort
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Send daily menu emails.")
     parser.add_argument("--date", type=str, help="YYYY-MM-DD date to fetch menu for (default: today)")
     parser.add_argument("--email", type=str, help="Send to a specific email address only")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        metavar="i/N",
+        help="Only send to users in shard i of N (0-based), split by a stable hash of email",
+    )
+    parser.add_argument(
+        "--ignore-ledger",
+        action="store_true",
+        help="Send even to users the ledger already marks as delivered for this date",
+    )
+    parser.add_argument(
+        "--ledger-supabase",
+        action="store_true",
+        help="Also read and bulk-write the send ledger in the Supabase send_ledger table",
+    )
+    parser.add_argument(
+        "--state-supabase",
+        action="store_true",
+        help="Also store the sent menu's station hashes in the Supabase menu_state table, for --update on another machine",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run the whole pipeline but MIME-encode messages instead of sending them, then print stage timings",
+    )
+    parser.add_argument(
+        "--spool-dir",
+        type=str,
+        help="With --dry-run, write each message to this directory as an .eml file (default: only count bytes)",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Compare a fresh menu with the one stored by the last send and re-send only to users whose digest or watchlist hits changed",
+    )
+    args = parser.parse_args(argv)
+    if args.spool_dir and not args.dry_run:
+        parser.error("--spool-dir requires --dry-run")
+    if args.update and args.shard[1] > 1:
+        parser.error("--update cannot be sharded; it only re-sends to affected users")
+    return args
 
-    # 0. Setup Supabase
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-    
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        logging.error("Supabase credentials missing. Check .env or secrets.")
-        return
+def run(args: argparse.Namespace, timer: RunMetrics, users: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+    """
+    Runs one send. Users are streamed from Supabase unless `users` is given
+    (rows shaped like USER_COLUMNS), in which case Supabase is not contacted.
+    """
+    shard_index, shard_count = args.shard
 
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # 0. Setup Supabase
+    supabase: Optional["Client"] = None
+    if users is None:
+        supabase = create_supabase_client()
+        if supabase is None:
+            logging.error("Supabase credentials missing. Check .env or secrets.")
+            return
 
-    # 1. Send Heartbeat (Keep-Alive)
-    try:
-        logging.info("Sending heartbeat to keep_alive table...")
-        # Upsert a row with id=1, updating the last_run timestamp
-        supabase.table("keep_alive").upsert({"id": 1, "last_run": datetime.datetime.now(datetime.timezone.utc).isoformat()}).execute()
-        logging.info("Heartbeat sent successfully.")
-    except Exception as e:
-        logging.error(f"Failed to send heartbeat: {e}")
+    # 1. Send Heartbeat (Keep-Alive), once per sharded run
+    if supabase is not None and shard_index == 0 and not args.dry_run:
+        send_heartbeat(supabase)
 
     # 2. Setup Date
     if args.date:
@@ -75,79 +413,234 @@ def main():
     else:
         today = datetime.date.today()
 
-    # 3. Process Users
-    users = get_users(supabase, args.email)
-    
-    if not users:
-        logging.info("No active users found.")
-        return
-
-    max_days_ahead = max(get_days_ahead(user.get("preferences", {})) for user in users)
-    target_dates = [today + datetime.timedelta(days=offset) for offset in range(max_days_ahead)]
-    menu_by_date: Dict[datetime.date, List[Dict[str, Any]]] = {}
+    # 3. Start streaming users; the first pages load while the menu is fetched
+    if users is None:
+        users = stream_users(supabase, args.email)
+    users = iter(users)
+    target_dates = [today + datetime.timedelta(days=offset) for offset in range(MAX_DAYS_AHEAD)]
 
+    logging.info(f"Fetching menu for {target_dates[0]} to {target_dates[-1]}...")
+    with timer.time("fetch"):
+        # --update must diff what Nutrislice serves now, not this morning's artifact.
+        menu_by_date: MenuRange = fetch_menu_range(target_dates[0], target_dates[-1], fresh=args.update)
     for target_date in target_dates:
-        logging.info(f"Fetching menu for {target_date}...")
-        raw_data = fetch_menu_data(target_date)
-        parsed_items = parse_menu(raw_data, target_date=target_date)
-        menu_by_date[target_date] = sort_menu_items(parsed_items)
         logging.info(
             "Found %s total menu items for %s.",
             len(menu_by_date[target_date]),
             target_date,
         )
 
-    for user in users:
-        email = user["email"]
-        token = user.get("token")
-        prefs = user.get("preferences", {})
-        days_ahead = get_days_ahead(prefs)
-        
-        if not token:
-             logging.warning(f"User {email} missing token. Skipping.")
-             continue
-
-        digest_items: List[Dict[str, Any]] = []
-        all_items_for_window: List[Dict[str, Any]] = []
-        for offset in range(days_ahead):
-            target_date = today + datetime.timedelta(days=offset)
-            current_date_items = menu_by_date.get(target_date, [])
-            all_items_for_window.extend(current_date_items)
-            digest_items.extend(filter_menu_for_user(current_date_items, prefs))
-
-        digest_items = sort_menu_items(digest_items)
-        watchlist_hits = find_watchlist_hits(all_items_for_window, prefs)
-            
-        if not digest_items and not watchlist_hits:
-            logging.info(
-                "Skipping %s: No digest items or watchlist hits across %s day(s).",
-                email,
-                days_ahead,
-            )
-            continue
-            
-        # 4. Generate & Send
-        html_body = generate_html_email(
-            digest_items,
-            token,
-            today,
-            days_ahead,
-            watchlist_hits=watchlist_hits,
+    # Stale or missing meals still go out (from the last good snapshot, where there is one),
+    # but they are never stored as the baseline for --update, nor diffed against it.
+    stale_menus = [f"{meal}@{week_start}" for meal, week_start in sorted(menu_by_date.stale)]
+    missing_menus = [f"{meal}@{week_start}" for meal, week_start in menu_by_date.missing]
+    menu_complete = not stale_menus and not missing_menus
+    if stale_menus:
+        logging.warning("Nutrislice unavailable; using stale snapshots for %s.", ", ".join(stale_menus))
+    if missing_menus:
+        logging.error("Nutrislice unavailable and no snapshot for %s; those meals are missing.", ", ".join(missing_menus))
+    timer.set_info(menu_stale=bool(stale_menus), stale_menus=stale_menus, missing_menus=missing_menus)
+
+    menu_items = [item for items in menu_by_date.values() for item in items]
+    menu_state = station_hashes(menu_items)
+    state_path = get_state_path()
+    state_supabase = supabase if args.state_supabase else None
+    previous_index = None
+    run_kind = "daily"
+    if args.update:
+        if state_path is None:
+            logging.error("--update needs the stored menu state, but MENU_STATE_PATH is off.")
+            return
+        if not menu_complete:
+            logging.error("Not diffing a stale or incomplete menu; try --update again once Nutrislice responds.")
+            return
+
+        try:
+            with MenuStateStore(state_path, supabase=state_supabase) as store:
+                previous_state = store.load(date.isoformat() for date in target_dates)
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Could not read the stored menu state from {state_path}: {e}")
+            return
+        if not previous_state:
+            logging.info("No stored menu for %s to %s; run the daily send first.", target_dates[0], target_dates[-1])
+            return
+
+        changed_stations = diff_menu_state(previous_state, menu_state)
+        if not changed_stations:
+            logging.info("Menu unchanged since the last send; nothing to update.")
+            return
+
+        for date_key, meal, station in changed_stations:
+            logging.info(f"Menu changed: {date_key} {meal} at {station}")
+        timer.set_info(changed_stations=len(changed_stations))
+        previous_index = MenuIndex(baseline_items(previous_state, menu_items))
+        # One ledger run per distinct updated menu: a crashed update resumes,
+        # and a later change notifies again.
+        run_kind = f"update-{fingerprint(menu_state)[:12]}"
+    elif not args.dry_run and shard_index == 0 and menu_complete:
+        if state_path is not None:
+            save_menu_state(state_path, menu_state, state_supabase)
+        # Only runs against the real user table are archived as menu history; injected
+        # users (the load harness, benchmarks) usually come with fixture menus.
+        if supabase is not None:
+            archive_menu_items(menu_items)
+
+    with timer.time("user load"):
+        first_user = next(users, None)
+    if first_user is None:
+        logging.info("No active users found.")
+        return
+
+    timer.set_info(date=today.isoformat(), shard=f"{shard_index}/{shard_count}", dry_run=args.dry_run, run_kind=run_kind)
+    spool = None
+    if args.dry_run:
+        spool = SpoolSender(Path(args.spool_dir) if args.spool_dir else None, timer=timer)
+
+    renderer = CohortRenderer(
+        MenuIndex(menu_items),
+        today,
+        timer,
+        from_email=spool.from_email if spool else get_smtp_settings()[2],
+        previous_index=previous_index,
+        subject_prefix="Menu Update: " if args.update else "",
+    )
+    user_count = 0
+    resumed_count = 0
+    unchanged_count = 0
+
+    ledger = None
+    if get_ledger_path() is not None and not args.dry_run:
+        ledger = SendLedger(today, run_kind=run_kind, supabase=supabase if args.ledger_supabase else None)
+    already_delivered = set() if ledger is None or args.ignore_ledger else ledger.delivered_emails()
+    if already_delivered:
+        logging.info("Ledger shows %s user(s) already delivered for %s.", len(already_delivered), today)
+    sent_today = 0
+    if ledger is not None and get_daily_quota():
+        sent_today = sum(
+            1
+            for email in ledger.delivered_recipients()
+            if shard_count == 1 or get_user_shard(email, shard_count) == shard_index
         )
-        if days_ahead == 1:
-            subject = f"Dickinson Daily Menu - {today.strftime('%b %d')}"
-        else:
-            end_date = today + datetime.timedelta(days=days_ahead - 1)
-            subject = f"Dickinson Daily Menu - {today.strftime('%b %d')} to {end_date.strftime('%b %d')}"
-        
+    if sent_today:
+        logging.info("%s message(s) already count against today's SMTP quota.", sent_today)
+
+    # 4. Generate once per cohort & send with each user's token filled in
+    try:
+        with DeliveryStage(
+            rate_limiter=RateLimiter(shard=args.shard, sent_today=sent_today),
+            send=spool,
+            send_prepared=spool.send_message if spool else None,
+            on_result=ledger.record if ledger else None,
+        ) as delivery:
+            for user in _timed_iter(itertools.chain([first_user], users), timer, "user load"):
+                email = user["email"]
+                if shard_count > 1 and get_user_shard(email, shard_count) != shard_index:
+                    continue
+
+                user_count += 1
+                if email in already_delivered:
+                    resumed_count += 1
+                    continue
+
+                token = user.get("token")
+                if not token:
+                    logging.warning(f"User {email} missing token. Skipping.")
+                    if ledger:
+                        ledger.record(email, STATUS_SKIPPED, "missing token")
+                    continue
+
+                message_started = time.perf_counter()
+                cohort = renderer.render(user.get("preferences") or {})
+                if not cohort["changed"]:
+                    unchanged_count += 1
+                    continue
+
+                if cohort["message"] is None:
+                    logging.info(
+                        "Skipping %s: No digest items or watchlist hits across %s day(s).",
+                        email,
+                        cohort["days_ahead"],
+                    )
+                    if ledger:
+                        ledger.record(email, STATUS_SKIPPED, "empty digest")
+                    continue
+
+                logging.info(
+                    "Sending email to %s with %s digest items and %s watchlist hits across %s day(s)...",
+                    email,
+                    cohort["digest_count"],
+                    cohort["watchlist_count"],
+                    cohort["days_ahead"],
+                )
+                with timer.time("personalize"):
+                    message = cohort["message"].render(email, token)
+                timer.observe("message_render_seconds", time.perf_counter() - message_started)
+                timer.observe("message_bytes", len(message))
+                if len(message) > GMAIL_CLIP_BYTES:
+                    timer.increment("messages_over_clip_limit")
+                delivery.submit_message(email, message)
+    finally:
+        if ledger:
+            ledger.close()
+
+    if args.update:
+        logging.info("Update: %s user(s) had no changes in their digest or watchlist hits.", unchanged_count)
+        if not args.dry_run:
+            save_menu_state(state_path, menu_state, state_supabase)
+            if supabase is not None:
+                archive_menu_items(menu_items)
+
+    logging.info(
+        "Rendered %s distinct digest(s) for %s user(s) in shard %s/%s; %s already delivered earlier.",
+        len(renderer.cohorts),
+        user_count,
+        shard_index,
+        shard_count,
+        resumed_count,
+    )
+    timer.set_info(
+        users=user_count,
+        cohorts=len(renderer.cohorts),
+        already_delivered=resumed_count,
+        unchanged=unchanged_count,
+        sent=delivery.sent,
+        failed=delivery.failed,
+        skipped_by_quota=delivery.skipped,
+    )
+    logging.info(
+        "Delivery finished: %s sent, %s failed, %s skipped by quota.",
+        delivery.sent,
+        delivery.failed,
+        delivery.skipped,
+    )
+
+    if spool is not None:
         logging.info(
-            "Sending email to %s with %s digest items and %s watchlist hits across %s day(s)...",
-            email,
-            len(digest_items),
-            len(watchlist_hits),
-            days_ahead,
+            "Dry run: %s message(s), %.1f KB total, %.1f KB average%s.",
+            spool.messages,
+            spool.bytes / 1024,
+            spool.bytes / 1024 / max(1, spool.messages),
+            f", spooled to {spool.spool_dir}" if spool.spool_dir else "",
         )
-        send_email(email, subject, html_body)
+        timer.log_report()
+
+    # 5. Pre-warm the menu snapshots tomorrow's run will need, when they will still be there
+    if shard_index != 0 or args.dry_run or not is_cache_dir_configured():
+        return
+
+    tomorrow_window = [today + datetime.timedelta(days=offset) for offset in range(1, MAX_DAYS_AHEAD + 1)]
+    prewarmed_weeks = prewarm_menu_weeks(tomorrow_window)
+    if prewarmed_weeks:
+        logging.info("Pre-warmed %s menu week(s) for the next run.", prewarmed_weeks)
+
+def main():
+    args = parse_args()
+    metrics = start_run_metrics()
+    try:
+        run(args, metrics)
+    finally:
+        write_run_metrics(metrics)
 
 if __name__ == "__main__":
-    main()
+    bootstrap()
+    run_profiled(main, get_profile_path())
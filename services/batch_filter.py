@@ -0,0 +1,119 @@
+import itertools
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
+
+from services.utils import MenuItem
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _import_numpy():
+    """
+    numpy is a dev/analysis dependency (requirements-dev.txt); the sender never needs it.
+    """
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "services.batch_filter needs numpy; install it with pip install -r requirements-dev.txt"
+        ) from e
+    return numpy
+
+
+class BatchMenuFilter:
+    """
+    Applies filter_menu_for_user to many users at once.
+    Each item's meal and station become integer category codes and every user's
+    choices a row of boolean category masks. Identical rows are collapsed with
+    np.unique, one fancy-indexing pass turns each distinct row into a mask over the
+    menu, and users get the index array of their row.
+    numpy is imported on first use and is only in requirements-dev.txt.
+    """
+
+    def __init__(self, menu_items: Sequence[MenuItem]):
+        np = _import_numpy()
+
+        self.items = list(menu_items)
+        self.meals = {meal: code for code, meal in enumerate(sorted({item.meal for item in self.items}))}
+        self.stations = {
+            station: code
+            for code, station in enumerate(sorted({item.station_key for item in self.items}))
+        }
+        self.meal_codes = np.fromiter((self.meals[item.meal] for item in self.items), dtype=np.intp, count=len(self.items))
+        self.station_codes = np.fromiter(
+            (self.stations[item.station_key] for item in self.items),
+            dtype=np.intp,
+            count=len(self.items),
+        )
+
+    @staticmethod
+    def _category_mask(
+        preferences_list: Sequence[Dict[str, Any]],
+        field: str,
+        categories: Dict[str, int],
+    ) -> "np.ndarray":
+        """
+        (users x categories) mask of the lowercased values in each user's `field`.
+        Each distinct raw string is lowercased and looked up once; the per-user work is
+        flattening the lists, and the user of every value comes from np.repeat.
+        """
+        np = _import_numpy()
+
+        values_per_user = [preferences.get(field, ()) for preferences in preferences_list]
+        values = list(itertools.chain.from_iterable(values_per_user))
+        codes_by_value = {value: categories.get(value.lower(), -1) for value in set(values)}
+        codes = np.fromiter(map(codes_by_value.__getitem__, values), dtype=np.intp, count=len(values))
+        users = np.repeat(
+            np.arange(len(values_per_user), dtype=np.intp),
+            np.fromiter(map(len, values_per_user), dtype=np.intp, count=len(values_per_user)),
+        )
+
+        known = codes >= 0
+        mask = np.zeros((len(values_per_user), len(categories)), dtype=bool)
+        mask[users[known], codes[known]] = True
+        return mask
+
+    def select_rows(self, preferences_list: Sequence[Dict[str, Any]]) -> List["np.ndarray"]:
+        """
+        Returns, per user, the (read-only) indexes into `items` that
+        filter_menu_for_user would keep, in menu order. Users with the same
+        choices share one array.
+        """
+        np = _import_numpy()
+
+        preferences_list = list(preferences_list)
+        if not preferences_list:
+            return []
+
+        choices = np.hstack([
+            self._category_mask(preferences_list, "meals", self.meals),
+            self._category_mask(preferences_list, "stations", self.stations),
+        ])
+        distinct, user_rows = np.unique(np.packbits(choices, axis=1), axis=0, return_inverse=True)
+        distinct = np.unpackbits(distinct, axis=1, count=choices.shape[1]).astype(bool)
+
+        # (distinct choices x items): an item is kept when both its meal and station are chosen.
+        meal_count = len(self.meals)
+        keep = distinct[:, :meal_count][:, self.meal_codes] & distinct[:, meal_count:][:, self.station_codes]
+
+        choice_index, item_index = np.nonzero(keep)
+        item_index.flags.writeable = False
+        boundaries = np.cumsum(np.bincount(choice_index, minlength=len(distinct)))[:-1]
+        results = np.split(item_index, boundaries)
+        return [results[row] for row in user_rows.reshape(-1).tolist()]
+
+    def select(self, preferences_list: Sequence[Dict[str, Any]]) -> List[List[MenuItem]]:
+        """
+        Like select_rows, but returns the MenuItems themselves.
+        """
+        return [[self.items[row] for row in rows] for rows in self.select_rows(preferences_list)]
+
+
+def filter_menu_for_users(
+    menu_items: Sequence[MenuItem],
+    preferences_list: Sequence[Dict[str, Any]],
+) -> List[List[MenuItem]]:
+    """
+    Batch version of filter_menu_for_user: one filtered item list per preferences dict.
+    """
+    return BatchMenuFilter(menu_items).select(preferences_list)
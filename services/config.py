@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# One place that loads .env and configures logging. Entry points call bootstrap();
+# library modules stay free of import-time side effects so CLIs start quickly.
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Values that turn off an optional file or feature setting.
+DISABLED_VALUES = {"", "0", "off", "false", "none"}
+
+_environment_loaded = False
+_bootstrap_lock = threading.Lock()
+
+
+def load_environment() -> None:
+    """
+    Loads variables from .env into os.environ once per process, without
+    overriding ones already set. Safe to call from anywhere that reads settings.
+    """
+    global _environment_loaded
+
+    with _bootstrap_lock:
+        if _environment_loaded:
+            return
+        _environment_loaded = True
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Configures root logging with the project format. The level comes from
+    `level`, then LOG_LEVEL, then INFO. A no-op when logging is already set up.
+    """
+    level_name = (level or os.getenv("LOG_LEVEL") or "INFO").upper()
+    logging.basicConfig(level=getattr(logging, level_name, logging.INFO), format=LOG_FORMAT)
+
+
+def bootstrap() -> None:
+    """
+    Process setup for command-line entry points: .env, then logging.
+    """
+    load_environment()
+    configure_logging()
+
+
+def is_disabled(value: str) -> bool:
+    return value.strip().lower() in DISABLED_VALUES
+
+
+def get_optional_path(env_name: str, default: Optional[Path] = None) -> Optional[Path]:
+    """
+    Path setting read from `env_name`: `default` when unset, None when set to a
+    DISABLED_VALUES value such as "off", otherwise the configured path.
+    """
+    configured = os.getenv(env_name)
+    if configured is None:
+        return default
+
+    if is_disabled(configured):
+        return None
+
+    return Path(configured).expanduser()
+
+
+def get_supabase_credentials() -> Tuple[Optional[str], Optional[str]]:
+    load_environment()
+    return os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+
+
+def create_supabase_client(url: Optional[str] = None, key: Optional[str] = None) -> Optional["Client"]:
+    """
+    Returns a Supabase client, or None when credentials are missing.
+    The SDK is imported here, on first use, because importing it costs
+    several hundred milliseconds that dry runs and previews never need.
+    """
+    default_url, default_key = get_supabase_credentials()
+    url = url or default_url
+    key = key or default_key
+    if not url or not key:
+        return None
+
+    from supabase import create_client
+
+    return create_client(url, key)
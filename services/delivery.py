@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, Union
+
+from services.email_sender import SMTPConnectionPool, send_email, send_message
+from services.ledger import STATUS_DELIVERED, STATUS_FAILED, STATUS_SKIPPED
+
+DEFAULT_WORKERS = 4
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def get_daily_quota() -> int:
+    """
+    Messages the SMTP provider allows per day across every run and shard (SMTP_DAILY_QUOTA; 0 = unlimited).
+    """
+    return _get_int_env("SMTP_DAILY_QUOTA", 0)
+
+
+def shard_share(total: int, shard_index: int, shard_count: int) -> int:
+    """
+    This shard's part of `total` when it is split as evenly as possible across shards.
+    """
+    return total // shard_count + (1 if shard_index < total % shard_count else 0)
+
+
+class QuotaExceeded(Exception):
+    """Raised when the provider's daily send quota is used up for this run."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills `rate` tokens per second.
+    """
+
+    def __init__(self, capacity: float, rate: float, tokens: Optional[float] = None):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity if tokens is None else min(capacity, tokens)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        """
+        Blocks until a token is available.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class RateLimiter:
+    """
+    Applies the provider's per-minute and per-day send quotas.
+    A quota of 0 means unlimited. Per-minute limits wait; an exhausted daily quota raises QuotaExceeded.
+    Both quotas are split across `shard` = (index, count), since shards send in parallel.
+    The day bucket starts with this shard's share minus `sent_today`, the messages its
+    users were already sent today according to the send ledger, so reruns and --update
+    sends do not get a fresh day's allowance.
+    """
+
+    def __init__(
+        self,
+        per_minute: Optional[int] = None,
+        per_day: Optional[int] = None,
+        shard: Tuple[int, int] = (0, 1),
+        sent_today: int = 0,
+    ):
+        per_minute = _get_int_env("SMTP_RATE_PER_MINUTE", 0) if per_minute is None else per_minute
+        per_day = get_daily_quota() if per_day is None else per_day
+        shard_index, shard_count = shard
+        self.minute_bucket = None
+        if per_minute:
+            per_minute = max(1, shard_share(per_minute, shard_index, shard_count))
+            self.minute_bucket = TokenBucket(per_minute, per_minute / 60)
+        self.day_bucket = None
+        if per_day:
+            shard_quota = max(1, shard_share(per_day, shard_index, shard_count))
+            self.day_bucket = TokenBucket(
+                shard_quota,
+                shard_quota / SECONDS_PER_DAY,
+                tokens=max(0, shard_quota - sent_today),
+            )
+
+    def acquire(self) -> None:
+        if self.day_bucket and not self.day_bucket.try_acquire():
+            raise QuotaExceeded("Daily SMTP quota reached.")
+        if self.minute_bucket:
+            self.minute_bucket.acquire()
+
+
+class DeliveryStage:
+    """
+    Sends rendered emails on a bounded worker pool.
+    `submit` blocks once `max_pending` messages are queued or in flight, so rendering
+    never runs far ahead of SMTP. Use as a context manager to wait for every send.
+    `on_result(email, status, detail)` is called from worker threads after each attempt.
+    `send` delivers (to, subject, html) via submit(); `send_prepared` delivers
+    pre-serialized messages via submit_message().
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_pending: Optional[int] = None,
+        send: Optional[Callable[[str, str, str], bool]] = None,
+        on_result: Optional[Callable[[str, str, Optional[str]], None]] = None,
+        send_prepared: Optional[Callable[[str, Union[str, bytes]], bool]] = None,
+    ):
+        self.workers = workers or _get_int_env("DELIVERY_WORKERS", DEFAULT_WORKERS) or DEFAULT_WORKERS
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.pool = None
+        if send is None or send_prepared is None:
+            self.pool = SMTPConnectionPool(size=self.workers)
+        if send is None:
+            send = lambda to_email, subject, html_body: send_email(to_email, subject, html_body, pool=self.pool)
+        if send_prepared is None:
+            send_prepared = lambda to_email, message: send_message(to_email, message, pool=self.pool)
+        self._send = send
+        self._send_prepared = send_prepared
+        self._on_result = on_result
+        self._pending = threading.BoundedSemaphore(max_pending or self.workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="delivery")
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def _deliver(self, to_email: str, send: Callable[[], bool]) -> bool:
+        try:
+            self.rate_limiter.acquire()
+        except QuotaExceeded as e:
+            logging.error(f"Not sending to {to_email}: {e}")
+            with self._lock:
+                self.skipped += 1
+            self._report(to_email, STATUS_SKIPPED, str(e))
+            return False
+
+        try:
+            success = bool(send())
+        except Exception as e:
+            logging.error(f"Delivery worker failed for {to_email}: {e}")
+            success = False
+
+        with self._lock:
+            if success:
+                self.sent += 1
+            else:
+                self.failed += 1
+        self._report(to_email, STATUS_DELIVERED if success else STATUS_FAILED, None)
+        return success
+
+    def _report(self, to_email: str, status: str, detail: Optional[str]) -> None:
+        if self._on_result is None:
+            return
+        try:
+            self._on_result(to_email, status, detail)
+        except Exception as e:
+            logging.error(f"Failed to record delivery result for {to_email}: {e}")
+
+    def submit(self, to_email: str, subject: str, html_body: str) -> Future:
+        return self._submit(to_email, lambda: self._send(to_email, subject, html_body))
+
+    def submit_message(self, to_email: str, message: Union[str, bytes]) -> Future:
+        return self._submit(to_email, lambda: self._send_prepared(to_email, message))
+
+    def _submit(self, to_email: str, send: Callable[[], bool]) -> Future:
+        self._pending.acquire()
+        try:
+            future = self._executor.submit(self._deliver, to_email, send)
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def close(self) -> None:
+        """
+        Waits for queued sends, then releases workers and SMTP sessions.
+        """
+        self._executor.shutdown(wait=True)
+        if self.pool is not None:
+            self.pool.close()
+
+    def __enter__(self) -> "DeliveryStage":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
@@ -1,46 +1,327 @@
+import atexit
+import itertools
+import queue
+import re
 import smtplib
 import os
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from email.policy import compat32
 import logging
-from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional, Union
 
-load_dotenv()
+from services.config import load_environment
+from services.metrics import get_run_metrics
 
-# Configure Logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+DEFAULT_POOL_SIZE = 1
+# Idle connections older than this are checked with NOOP before reuse.
+HEALTHCHECK_IDLE_SECONDS = 30
+# Errors that mean the session is gone and a fresh connection should be tried.
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+# Per-message rejections (bounced recipient, refused data): the session itself is fine
+# and goes back to the pool after RSET instead of costing a new connect and login.
+RESET_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+# Serializes like Message.as_string() (headers unfolded), but with SMTP's CRLF line endings.
+SMTP_POLICY = compat32.clone(linesep="\r\n", max_line_length=0)
 
-def send_email(to_email, subject, html_body):
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_smtp_settings():
     """
-    Sends an HTML email using SMTP credentials from environment variables.
-    Returns True if successful, False otherwise.
+    Reads SMTP settings from environment variables.
+    Returns (server, port, email, password).
     """
-    # Load Credentials
+    load_environment()
     smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     smtp_port = int(os.getenv("SMTP_PORT", 587))
     smtp_email = os.getenv("SMTP_EMAIL")
     smtp_password = os.getenv("SMTP_PASSWORD")
+    return smtp_server, smtp_port, smtp_email, smtp_password
+
+
+def get_starttls_enabled() -> bool:
+    """
+    STARTTLS is on unless SMTP_STARTTLS is set to off, e.g. for a local test sink.
+    """
+    return os.getenv("SMTP_STARTTLS", "1").strip().lower() not in {"0", "off", "false", "no"}
+
+
+def get_pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("SMTP_POOL_SIZE", DEFAULT_POOL_SIZE)))
+    except ValueError:
+        return DEFAULT_POOL_SIZE
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` authenticated SMTP sessions open and reuses them across messages.
+    Dropped or expired sessions are replaced transparently and the send is retried once.
+    """
+
+    def __init__(self, size: Optional[int] = None, server=None, port=None, email=None, password=None):
+        default_server, default_port, default_email, default_password = get_smtp_settings()
+        self.size = size or get_pool_size()
+        self.server = server or default_server
+        self.port = int(port or default_port)
+        self.email = email or default_email
+        self.password = password or default_password
+        self.starttls = get_starttls_enabled()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.server, self.port)
+        try:
+            if self.starttls:
+                connection.starttls()
+            connection.login(self.email, self.password)
+        except Exception:
+            self._quit(connection)
+            raise
+        return connection
+
+    @staticmethod
+    def _quit(connection: smtplib.SMTP) -> None:
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    @staticmethod
+    def _reset(connection: smtplib.SMTP) -> bool:
+        try:
+            return connection.rset()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _is_alive(connection: smtplib.SMTP) -> bool:
+        try:
+            return connection.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    connection, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+
+                if time.monotonic() - last_used < HEALTHCHECK_IDLE_SECONDS or self._is_alive(connection):
+                    return connection
+
+                logging.info("Discarding expired SMTP session.")
+                self._quit(connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, connection: Optional[smtplib.SMTP]) -> None:
+        if connection is not None:
+            if self._closed:
+                self._quit(connection)
+            else:
+                self._idle.put((connection, time.monotonic()))
+        self._slots.release()
+
+    def send(self, from_email: str, to_email: str, message: Union[str, bytes]) -> None:
+        """
+        Sends an already-serialized message, reconnecting once if the session dropped.
+        Raises the underlying smtplib error if the send still fails; after a per-message
+        rejection the session is reset and reused.
+        """
+        metrics = get_run_metrics()
+        started = time.perf_counter()
+        connection = self._acquire()
+        try:
+            try:
+                connection.sendmail(from_email, to_email, message)
+            except RECONNECT_ERRORS as e:
+                logging.warning(f"SMTP session dropped ({e}); reconnecting.")
+                metrics.increment("smtp_retries")
+                self._quit(connection)
+                connection = None
+                connection = self._connect()
+                connection.sendmail(from_email, to_email, message)
+        except Exception as e:
+            if connection is not None and isinstance(e, RESET_ERRORS) and self._reset(connection):
+                self._release(connection)
+            else:
+                if connection is not None:
+                    self._quit(connection)
+                self._release(None)
+            raise
+        finally:
+            metrics.observe("smtp_send_seconds", time.perf_counter() - started)
+
+        self._release(connection)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(connection)
+
+
+def get_default_pool() -> SMTPConnectionPool:
+    """
+    Returns the process-wide pool used by send_email, closed automatically at exit.
+    """
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SMTPConnectionPool()
+            atexit.register(_default_pool.close)
+
+    return _default_pool
+
+
+def _build_mime(from_email, to_email, subject, html_body) -> MIMEMultipart:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_email
+    if to_email is not None:
+        msg["To"] = to_email
+    msg.attach(MIMEText(html_body, "html"))
+    return msg
+
+
+def build_message(from_email, to_email, subject, html_body) -> str:
+    """
+    Builds and serializes the multipart/alternative message send_email delivers.
+    """
+    return _build_mime(from_email, to_email, subject, html_body).as_string()
+
+
+class MessageTemplate:
+    """
+    One message serialized once and sent to many recipients.
+    The HTML is made 7-bit clean (non-ASCII becomes character references, which render
+    the same), so the encoded body is the HTML itself and each recipient only costs
+    inserting the To header and splicing `token` into the placeholder positions.
+    """
+
+    def __init__(self, from_email: str, subject: str, html_body: str, placeholder: str):
+        self.from_email = from_email or ""
+        self.subject = subject
+        self.html_body = html_body
+        self.placeholder = placeholder
+
+        ascii_html = html_body.encode("ascii", "xmlcharrefreplace").decode("ascii")
+        msg = _build_mime(self.from_email, None, subject, ascii_html)
+        serialized = msg.as_bytes(policy=SMTP_POLICY)
+        headers, _, body = serialized.partition(b"\r\n\r\n")
+        self._headers = headers + b"\r\nTo: "
+        self._body_parts = (b"\r\n\r\n" + body).split(placeholder.encode("ascii"))
+
+    @staticmethod
+    def _is_plain(value: str, max_length: int) -> bool:
+        return value.isascii() and len(value) <= max_length and not any(char in value for char in "\r\n")
+
+    def render(self, to_email: str, token: str) -> bytes:
+        """
+        Returns the CRLF-terminated message for one recipient, ready for SMTP.
+        Non-ASCII addresses or tokens, which need encoding, go through the full builder.
+        """
+        token = str(token)
+        if self._is_plain(to_email, 990) and self._is_plain(token, 990):
+            return self._headers + to_email.encode("ascii") + token.encode("ascii").join(self._body_parts)
+
+        msg = _build_mime(self.from_email, to_email, self.subject, self.html_body.replace(self.placeholder, token))
+        return msg.as_bytes(policy=SMTP_POLICY)
 
-    if not smtp_email or not smtp_password:
+
+def send_message(to_email: str, message: Union[str, bytes], pool: Optional[SMTPConnectionPool] = None) -> bool:
+    """
+    Sends an already-serialized message, e.g. from MessageTemplate.render.
+    Returns True if successful, False otherwise.
+    """
+    pool = pool or get_default_pool()
+
+    if not pool.email or not pool.password:
         logging.error("SMTP credentials are missing!")
         return False
 
     try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = smtp_email
-        msg["To"] = to_email
-        msg.attach(MIMEText(html_body, "html"))
-
-        # Connect and Send
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_email, smtp_password)
-            server.sendmail(smtp_email, to_email, msg.as_string())
-        
+        pool.send(pool.email, to_email, message)
+
         logging.info(f"Email sent successfully to {to_email}")
         return True
 
     except Exception as e:
         logging.error(f"Failed to send email to {to_email}: {e}")
         return False
+
+
+def send_email(to_email, subject, html_body, pool: Optional[SMTPConnectionPool] = None):
+    """
+    Sends an HTML email using SMTP credentials from environment variables.
+    Connections come from `pool`, or a shared default pool, so repeated calls reuse one session.
+    Returns True if successful, False otherwise.
+    """
+    pool = pool or get_default_pool()
+
+    if not pool.email or not pool.password:
+        logging.error("SMTP credentials are missing!")
+        return False
+
+    return send_message(to_email, build_message(pool.email, to_email, subject, html_body), pool=pool)
+
+
+class SpoolSender:
+    """
+    Drop-in replacement for send_email that never touches SMTP.
+    Messages are MIME-encoded exactly as for a real send, then written to
+    `spool_dir` as .eml files, or only counted when no directory is given.
+    """
+
+    def __init__(self, spool_dir: Optional[Path] = None, from_email: Optional[str] = None, timer=None):
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self.from_email = from_email or os.getenv("SMTP_EMAIL") or "dry-run@localhost"
+        self.timer = timer
+        self.messages = 0
+        self.bytes = 0
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        if self.spool_dir:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+
+    def __call__(self, to_email, subject, html_body) -> bool:
+        started = time.perf_counter()
+        message = build_message(self.from_email, to_email, subject, html_body).encode("utf-8")
+        if self.timer:
+            self.timer.add("mime encoding", time.perf_counter() - started)
+
+        return self.send_message(to_email, message)
+
+    def send_message(self, to_email: str, message: Union[str, bytes]) -> bool:
+        """
+        Spools an already-serialized message, e.g. from MessageTemplate.render.
+        """
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+
+        with self._lock:
+            sequence = next(self._sequence)
+            self.messages += 1
+            self.bytes += len(message)
+
+        if self.spool_dir:
+            safe_name = re.sub(r"[^A-Za-z0-9@._-]", "_", to_email)
+            (self.spool_dir / f"{sequence:06d}-{safe_name}.eml").write_bytes(message)
+
+        return True
@@ -1,15 +1,39 @@
 import datetime
 import os
+import re
 from html import escape
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
 
-from services.utils import MEAL_TYPES, STATION_ORDER
+from services.utils import MEAL_TYPES, DigestSections, MenuDigest, MenuIndex, MenuItem, StationBuckets
+
+# Stands in for the subscriber token when one rendered body is shared by many users.
+TOKEN_PLACEHOLDER = "__DAILY_MENU_TOKEN__"
+# Gmail clips message bodies past roughly this size behind a "View entire message" link.
+GMAIL_CLIP_BYTES = 102 * 1024
+RENDER_MODES = ("compact", "full")
+DEFAULT_RENDER_MODE = "compact"
 
 
 def _get_base_url():
     return (os.getenv("SITE_URL") or "http://localhost:3000").rstrip("/")
 
 
+def get_render_mode() -> str:
+    """
+    Returns "compact" (minified markup, one table per station) or "full" (indented
+    markup, one table per card). Both inline every style. Configurable with EMAIL_RENDER_MODE.
+    """
+    mode = os.getenv("EMAIL_RENDER_MODE", DEFAULT_RENDER_MODE).strip().lower()
+    return mode if mode in RENDER_MODES else DEFAULT_RENDER_MODE
+
+
+def fill_token(html_body: str, token: str) -> str:
+    """
+    Swaps TOKEN_PLACEHOLDER for a subscriber's token in a body rendered once per cohort.
+    """
+    return html_body.replace(TOKEN_PLACEHOLDER, str(token))
+
+
 def _format_long_date(date_value: datetime.date) -> str:
     return date_value.strftime("%A, %B %d, %Y")
 
@@ -26,39 +50,21 @@ def _escape_text(value: Any) -> str:
     return escape(str(value))
 
 
-def _chunk_list(items: List[Dict[str, Any]], size: int) -> List[List[Dict[str, Any]]]:
+def _chunk_list(items: List[MenuItem], size: int) -> List[List[MenuItem]]:
     return [items[index:index + size] for index in range(0, len(items), size)]
 
 
-def _sort_cards(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    return sorted(
-        items,
-        key=lambda item: (
-            item.get("date", ""),
-            MEAL_TYPES.index(item["meal"]) if item.get("meal") in MEAL_TYPES else 99,
-            STATION_ORDER.get(item.get("station", "").lower(), 999),
-            item.get("station", "").lower(),
-            item.get("name", "").lower(),
-        ),
-    )
-
-
-def _group_items_for_digest(menu_items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, List[Dict[str, Any]]]]]:
-    grouped: Dict[str, Dict[str, Dict[str, List[Dict[str, Any]]]]] = {}
+def _sort_cards(items: List[MenuItem]) -> List[MenuItem]:
+    return sorted(items, key=lambda item: item.sort_key)
 
-    for item in _sort_cards(menu_items):
-        date_key = item.get("date") or "unknown-date"
-        meal_key = item.get("meal", "other").capitalize()
-        station_key = item.get("station", "General")
-        grouped.setdefault(date_key, {})
-        grouped[date_key].setdefault(meal_key, {})
-        grouped[date_key][meal_key].setdefault(station_key, [])
-        grouped[date_key][meal_key][station_key].append(item)
 
-    return grouped
+def _group_items_for_digest(menu_items: Union[List[MenuItem], MenuDigest]) -> DigestSections:
+    if isinstance(menu_items, MenuDigest):
+        return menu_items.sections
+    return MenuIndex(menu_items).select().sections
 
 
-def _build_card_table(items: List[Dict[str, Any]]) -> str:
+def _build_card_table(items: List[MenuItem]) -> str:
     rows_html = []
 
     for row in _chunk_list(items, 3):
@@ -70,7 +76,7 @@ def _build_card_table(items: List[Dict[str, Any]]) -> str:
                     <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="border: 1px solid #ece0d2; border-radius: 12px; background: #fffdfa;">
                         <tr>
                             <td style="padding: 10px 12px; font-size: 15px; line-height: 1.32; color: #231815; font-weight: 600;">
-                                {_escape_text(item["name"])}
+                                {item.name_html}
                             </td>
                         </tr>
                     </table>
@@ -86,19 +92,8 @@ def _build_card_table(items: List[Dict[str, Any]]) -> str:
     return f'<table role="presentation" width="100%" cellpadding="0" cellspacing="0">{"".join(rows_html)}</table>'
 
 
-def _build_station_sections(stations: Dict[str, List[Dict[str, Any]]]) -> str:
-    sections = []
-    sorted_stations = sorted(
-        stations.keys(),
-        key=lambda station: (
-            STATION_ORDER.get(station.lower(), 999),
-            station.lower(),
-        ),
-    )
-
-    for station in sorted_stations:
-        sections.append(
-            f"""
+def _build_station_block(station: str, items: List[MenuItem]) -> str:
+    return f"""
             <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="margin-top: 12px; border: 1px solid #efe2d4; border-radius: 18px; background: #fffaf4;">
                 <tr>
                     <td style="padding: 14px 16px 2px; font-size: 16px; line-height: 1.3; color: #6f1523; font-weight: 700;">
@@ -107,37 +102,301 @@ def _build_station_sections(stations: Dict[str, List[Dict[str, Any]]]) -> str:
                 </tr>
                 <tr>
                     <td style="padding: 0 10px 10px;">
-                        {_build_card_table(stations[station])}
+                        {_build_card_table(items)}
                     </td>
                 </tr>
             </table>
             """
-        )
 
-    return "".join(sections)
 
+def _build_station_sections(
+    stations: StationBuckets,
+    fragment_cache: Optional["FragmentCache"] = None,
+) -> str:
+    fragment_cache = fragment_cache or FragmentCache()
+    return "".join(
+        fragment_cache.station_block(station, items)
+        for station, items in stations
+    )
+
+
+_MEAL_SECTION_OPEN = """
+                <tr>
+                    <td style="padding: 0 22px 18px;">
+                        <div style="font-size: 20px; font-weight: 700; color: #8e1f2f; margin-bottom: 10px;">{meal}</div>
+                        """
+_MEAL_SECTION_CLOSE = """
+                    </td>
+                </tr>
+                """
+_DATE_SECTION_OPEN = """
+                <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="margin-top: 22px;">
+                    <tr>
+                        <td valign="middle" style="padding: 6px 8px 12px;">
+                            <div style="font-size: 24px; line-height: 1.2; color: #201815; font-weight: 700;">{date_label}</div>
+                        </td>
+                    </tr>
+                    """
+_DATE_SECTION_CLOSE = """
+                </table>
+                """
+
+
+_TABLE_TAGS = "html|head|body|style|table|tr|td|div|meta"
 
-def _build_watchlist_section(watchlist_hits: List[Dict[str, Any]]) -> str:
+
+def _minify_html(template: str) -> str:
+    """
+    Collapses whitespace the way a browser would render it, drops it around table and
+    block tags, and breaks lines at rows and nested tables so none nears SMTP's 998 limit.
+    """
+    compact = re.sub(r"\s+", " ", template)
+    compact = re.sub(rf"\s*(</?(?:{_TABLE_TAGS})\b[^>]*>)\s*", r"\1", compact)
+    compact = re.sub(
+        r'style="([^"]*)"',
+        lambda match: 'style="' + re.sub(r"\s*([:;])\s*", r"\1", match.group(1)).rstrip(";") + '"',
+        compact,
+    )
+    return compact.strip().replace("</tr>", "</tr>\n").replace("><table", ">\n<table")
+
+
+# Minified styles of the cards, stations, meals and dates in the full templates. The
+# compact templates name them by class and _inline_styles writes them back as style=
+# attributes, since Outlook and Gmail for non-Google accounts drop <style> blocks.
+_COMPACT_STYLES = {
+    "s": "margin-top:12px;border:1px solid #efe2d4;border-radius:18px;background:#fffaf4",
+    "t": "padding:14px 16px 0;font-size:16px;line-height:1.3;color:#6f1523;font-weight:700",
+    "b": "padding:0 5px 5px",
+    "c": "border:1px solid #ece0d2;border-radius:12px;background:#fffdfa;padding:10px 12px;font-size:15px;line-height:1.32;color:#231815;font-weight:600",
+    "m": "padding:0 22px 18px",
+    "mh": "font-size:20px;font-weight:700;color:#8e1f2f;margin-bottom:10px",
+    "d": "margin-top:22px",
+    "dh": "padding:6px 8px 12px",
+    "dl": "font-size:24px;line-height:1.2;color:#201815;font-weight:700",
+    "w": "padding:0 0 10px;font-size:15px;line-height:1.4;color:#231815",
+    "l": "color:#8e1f2f;text-decoration:none;font-weight:700",
+}
+
+
+def _inline_styles(template: str) -> str:
+    return re.sub(r'class="(\w+)"', lambda match: f'style="{_COMPACT_STYLES[match.group(1)]}"', template)
+
+
+# Cards are cells of one table per station (spaced by cellspacing) instead of a table each.
+_COMPACT_CARD = _inline_styles('<td valign="top" width="33%" class="c">{name}</td>')
+_COMPACT_CARD_FILLER = '<td width="33%"></td>'
+_COMPACT_STATION_BLOCK = _inline_styles(_minify_html("""
+    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" class="s">
+        <tr><td class="t">{station}</td></tr>
+        <tr>
+            <td class="b">
+                <table role="presentation" width="100%" cellpadding="0" cellspacing="10">{rows}</table>
+            </td>
+        </tr>
+    </table>
+"""))
+_COMPACT_MEAL_SECTION_OPEN = _inline_styles(_minify_html("""
+    <tr>
+        <td class="m">
+            <div class="mh">{meal}</div>
+"""))
+_COMPACT_MEAL_SECTION_CLOSE = _minify_html("""
+        </td>
+    </tr>
+""")
+_COMPACT_DATE_SECTION_OPEN = _inline_styles(_minify_html("""
+    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" class="d">
+        <tr>
+            <td valign="middle" class="dh">
+                <div class="dl">{date_label}</div>
+            </td>
+        </tr>
+"""))
+_COMPACT_DATE_SECTION_CLOSE = "</table>"
+_COMPACT_WATCHLIST_ROW = _inline_styles(_minify_html("""
+    <tr>
+        <td class="w">
+            <strong>{date_label}</strong>
+            &nbsp;&middot;&nbsp;{meal}
+            &nbsp;&middot;&nbsp;{station}
+            &nbsp;&middot;&nbsp;{name}
+        </td>
+    </tr>
+"""))
+_COMPACT_WATCHLIST_SECTION = _minify_html("""
+    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="margin-top: 18px; border: 1px solid #efdfcc; border-radius: 18px; background: #fffaf4;">
+        <tr>
+            <td style="padding: 18px 20px 8px; font-size: 18px; font-weight: 700; color: #8e1f2f;">
+                <span style="color: #e0a100; font-size: 20px; line-height: 1;">&#9733;</span>
+                <span style="margin-left: 6px;">Watchlist</span>
+            </td>
+        </tr>
+        <tr>
+            <td style="padding: 0 20px 10px;">
+                <table role="presentation" width="100%" cellpadding="0" cellspacing="0">{rows}</table>
+            </td>
+        </tr>
+    </table>
+""")
+_COMPACT_EMPTY_DIGEST = _minify_html("""
+    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="margin-top: 22px; border: 1px solid #eedfcf; border-radius: 20px; background: #fffdf8;">
+        <tr>
+            <td style="padding: 28px 22px; text-align: center; color: #665e58; font-size: 16px;">
+                No menu items matched your current meal and station preferences for this send.
+            </td>
+        </tr>
+    </table>
+""")
+_COMPACT_BODY = _inline_styles(_minify_html("""
+    <html>
+    <body style="margin: 0; padding: 0; background: #f5ede2; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; color: #231815;">
+        <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background: #f5ede2; padding: 24px 12px;">
+            <tr>
+                <td align="center">
+                    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="max-width: 960px; background: #fff9f1; border: 1px solid #ead8c2; border-radius: 28px; overflow: hidden;">
+                        <tr>
+                            <td bgcolor="#f7e5d2" style="padding: 24px 28px 16px; background-color: #f7e5d2; border-bottom: 1px solid #ead3ba;">
+                                <table role="presentation" width="100%" cellpadding="0" cellspacing="0">
+                                    <tr>
+                                        <td valign="middle" style="font-size: 16px; font-weight: 700; letter-spacing: 0.08em; text-transform: uppercase; color: #8e1f2f;">
+                                            Dickinson Daily Menu
+                                        </td>
+                                        <td align="right" valign="middle">
+                                            <a href="{full_menu_url}" style="display: inline-block; min-width: 154px; text-align: center; white-space: nowrap; background: #8e1f2f; color: #fff8f1; text-decoration: none; padding: 10px 18px; border-radius: 999px; font-size: 14px; font-weight: 700;">{full_menu_label}</a>
+                                        </td>
+                                    </tr>
+                                </table>
+                            </td>
+                        </tr>
+                        <tr><td style="padding: 8px 20px 0;">{watchlist_section}</td></tr>
+                        <tr><td style="padding: 0 20px 0;">{date_sections}</td></tr>
+                        <tr>
+                            <td style="padding: 22px 28px 30px; text-align: center; color: #6d645b; font-size: 13px; line-height: 1.6;">
+                                <div>You are receiving this email because you subscribed to Dickinson Daily Menu.</div>
+                                <div style="margin-top: 10px;">
+                                    <a href="{full_menu_url}" class="l">View full menu</a>
+                                    &nbsp;|&nbsp;
+                                    <a href="{manage_url}" class="l">Manage preferences</a>
+                                    &nbsp;|&nbsp;
+                                    <a href="{unsubscribe_url}" class="l">Unsubscribe</a>
+                                </div>
+                            </td>
+                        </tr>
+                    </table>
+                </td>
+            </tr>
+        </table>
+    </body>
+    </html>
+"""))
+
+
+def _build_compact_station_block(station: str, items: List[MenuItem]) -> str:
+    rows = []
+    for row in _chunk_list(items, 3):
+        cells = [_COMPACT_CARD.format(name=item.name_html) for item in row]
+        cells.extend([_COMPACT_CARD_FILLER] * (3 - len(cells)))
+        rows.append(f"<tr>{''.join(cells)}</tr>\n")
+
+    return _COMPACT_STATION_BLOCK.format(station=_escape_text(station), rows="".join(rows))
+
+
+class FragmentCache:
+    """
+    Per-run memo of rendered digest fragments.
+    A (date, meal, station) block looks the same in every email that includes it,
+    so each block, meal header and date header is rendered once and then joined.
+    Fragments are built for one render mode (see get_render_mode).
+    """
+
+    def __init__(self, compact: Optional[bool] = None):
+        self.compact = get_render_mode() == "compact" if compact is None else compact
+        self._station_blocks: Dict[Any, str] = {}
+        self._meal_headers: Dict[str, str] = {}
+        self._date_headers: Dict[str, str] = {}
+
+    def station_block(self, station: str, items: List[MenuItem]) -> str:
+        key = (station, items if isinstance(items, tuple) else tuple(items))
+        block = self._station_blocks.get(key)
+        if block is None:
+            if self.compact:
+                block = _build_compact_station_block(station, items)
+            else:
+                block = _build_station_block(station, items)
+            self._station_blocks[key] = block
+        return block
+
+    def meal_header(self, meal: str) -> str:
+        header = self._meal_headers.get(meal)
+        if header is None:
+            template = _COMPACT_MEAL_SECTION_OPEN if self.compact else _MEAL_SECTION_OPEN
+            header = template.format(meal=meal)
+            self._meal_headers[meal] = header
+        return header
+
+    @property
+    def meal_footer(self) -> str:
+        return _COMPACT_MEAL_SECTION_CLOSE if self.compact else _MEAL_SECTION_CLOSE
+
+    @property
+    def date_footer(self) -> str:
+        return _COMPACT_DATE_SECTION_CLOSE if self.compact else _DATE_SECTION_CLOSE
+
+    def date_header(self, date_key: str) -> str:
+        header = self._date_headers.get(date_key)
+        if header is None:
+            try:
+                date_label = _format_long_date(datetime.date.fromisoformat(date_key))
+            except ValueError:
+                date_label = date_key
+            template = _COMPACT_DATE_SECTION_OPEN if self.compact else _DATE_SECTION_OPEN
+            header = template.format(date_label=_escape_text(date_label))
+            self._date_headers[date_key] = header
+        return header
+
+
+def _build_compact_watchlist_section(watchlist_hits: List[MenuItem]) -> str:
     if not watchlist_hits:
         return ""
 
     rows = []
     for item in _sort_cards(watchlist_hits):
         try:
-            parsed_date = datetime.date.fromisoformat(item.get("date", ""))
+            date_label = _format_watchlist_date(datetime.date.fromisoformat(item.date or ""))
+        except ValueError:
+            date_label = item.date or ""
+
+        rows.append(_COMPACT_WATCHLIST_ROW.format(
+            date_label=_escape_text(date_label),
+            meal=_escape_text(item.meal.capitalize()),
+            station=_escape_text(item.station),
+            name=item.name_html,
+        ))
+
+    return _COMPACT_WATCHLIST_SECTION.format(rows="".join(rows))
+
+
+def _build_watchlist_section(watchlist_hits: List[MenuItem]) -> str:
+    if not watchlist_hits:
+        return ""
+
+    rows = []
+    for item in _sort_cards(watchlist_hits):
+        try:
+            parsed_date = datetime.date.fromisoformat(item.date or "")
             date_label = _format_watchlist_date(parsed_date)
         except ValueError:
-            date_label = item.get("date", "")
+            date_label = item.date or ""
 
-        meal_label = str(item.get("meal", "")).capitalize()
+        meal_label = item.meal.capitalize()
         rows.append(
             f"""
             <tr>
                 <td style="padding: 0 0 10px; font-size: 15px; line-height: 1.4; color: #231815;">
                     <strong>{_escape_text(date_label)}</strong>
                     &nbsp;&middot;&nbsp;{_escape_text(meal_label)}
-                    &nbsp;&middot;&nbsp;{_escape_text(item.get("station", "General"))}
-                    &nbsp;&middot;&nbsp;{_escape_text(item.get("name", ""))}
+                    &nbsp;&middot;&nbsp;{_escape_text(item.station)}
+                    &nbsp;&middot;&nbsp;{item.name_html}
                 </td>
             </tr>
             """
@@ -213,63 +472,60 @@ def generate_manage_link_email(user_email, token):
 
 
 def generate_html_email(
-    menu_items: List[Dict[str, Any]],
+    menu_items: Union[List[MenuItem], MenuDigest],
     token: str,
     start_date: datetime.date,
     days_ahead: int,
-    watchlist_hits: Optional[List[Dict[str, Any]]] = None,
+    watchlist_hits: Optional[List[MenuItem]] = None,
+    fragment_cache: Optional[FragmentCache] = None,
+    compact: Optional[bool] = None,
 ):
     """
     Generates an HTML email body for a 1-2 day filtered digest.
+    `menu_items` may be a MenuDigest from MenuIndex.select, which is rendered as-is.
+    Pass one FragmentCache per run to reuse station, meal and date sections across emails;
+    its render mode wins over `compact`, which otherwise defaults to get_render_mode().
     """
+    fragment_cache = fragment_cache or FragmentCache(compact)
+    compact = fragment_cache.compact
     base_url = _get_base_url()
     manage_url = f"{base_url}/manage?token={token}"
     unsubscribe_url = f"{base_url}/unsubscribe?token={token}"
     full_menu_url = f"{base_url}/menu?date={start_date.isoformat()}"
     grouped = _group_items_for_digest(menu_items)
-    watchlist_section = _build_watchlist_section(watchlist_hits or [])
+    if compact:
+        watchlist_section = _build_compact_watchlist_section(watchlist_hits or [])
+    else:
+        watchlist_section = _build_watchlist_section(watchlist_hits or [])
 
     full_menu_label = "View full menu"
 
     date_sections = []
-    meal_order = ["Breakfast", "Lunch", "Dinner"]
-
-    for date_key, meals in grouped.items():
-        try:
-            parsed_date = datetime.date.fromisoformat(date_key)
-            date_label = _format_long_date(parsed_date)
-        except ValueError:
-            date_label = date_key
 
+    for date_key, meals in grouped:
         meal_sections = []
-        for meal in meal_order:
-            if meal not in meals:
+        for meal, stations in meals:
+            if meal not in MEAL_TYPES:
                 continue
 
-            meal_sections.append(
-                f"""
-                <tr>
-                    <td style="padding: 0 22px 18px;">
-                        <div style="font-size: 20px; font-weight: 700; color: #8e1f2f; margin-bottom: 10px;">{meal}</div>
-                        {_build_station_sections(meals[meal])}
-                    </td>
-                </tr>
-                """
-            )
+            meal_sections.append(fragment_cache.meal_header(meal.capitalize()))
+            meal_sections.append(_build_station_sections(stations, fragment_cache))
+            meal_sections.append(fragment_cache.meal_footer)
 
         if meal_sections:
-            date_sections.append(
-                f"""
-                <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="margin-top: 22px;">
-                    <tr>
-                        <td valign="middle" style="padding: 6px 8px 12px;">
-                            <div style="font-size: 24px; line-height: 1.2; color: #201815; font-weight: 700;">{_escape_text(date_label)}</div>
-                        </td>
-                    </tr>
-                    {''.join(meal_sections)}
-                </table>
-                """
-            )
+            date_sections.append(fragment_cache.date_header(date_key))
+            date_sections.extend(meal_sections)
+            date_sections.append(fragment_cache.date_footer)
+
+    if compact:
+        return _COMPACT_BODY.format(
+            full_menu_url=full_menu_url,
+            full_menu_label=full_menu_label,
+            watchlist_section=watchlist_section,
+            date_sections="".join(date_sections) or _COMPACT_EMPTY_DIGEST,
+            manage_url=manage_url,
+            unsubscribe_url=unsubscribe_url,
+        )
 
     if not date_sections:
         date_sections.append(
@@ -0,0 +1,134 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+# Upstream fetch policy: one deadline per fetch batch, jittered retries inside it,
+# and a circuit breaker that stops hammering Nutrislice once it is clearly down.
+DEFAULT_DEADLINE_SECONDS = 20.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 4.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_SECONDS = 60.0
+# Statuses worth retrying; other 4xx responses will not change on a second try.
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+_breaker: Optional["CircuitBreaker"] = None
+_breaker_lock = threading.Lock()
+
+
+def _get_float_env(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def get_deadline_seconds() -> float:
+    """
+    Total time one fetch batch may spend on Nutrislice, retries included.
+    Configurable with NUTRISLICE_FETCH_DEADLINE_SECONDS.
+    """
+    return _get_float_env("NUTRISLICE_FETCH_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS)
+
+
+def get_max_attempts() -> int:
+    """
+    Attempts per (meal, week) request, from NUTRISLICE_MAX_ATTEMPTS.
+    """
+    return max(1, int(_get_float_env("NUTRISLICE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)))
+
+
+class Deadline:
+    """
+    A point in monotonic time shared by every request in a batch.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = get_deadline_seconds() if seconds is None else seconds
+        self._expires = time.monotonic() + self.seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def backoff_seconds(attempt: int, base: float = DEFAULT_BACKOFF_SECONDS, cap: float = MAX_BACKOFF_SECONDS) -> float:
+    """
+    "Full jitter" backoff before retry number `attempt` (1-based): uniform in
+    [0, min(cap, base * 2 ** (attempt - 1))], so parallel retries spread out.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast for `reset_seconds`.
+    After that one trial request is let through (half-open); success closes the
+    breaker again, failure re-opens it.
+    """
+
+    def __init__(self, threshold: Optional[int] = None, reset_seconds: Optional[float] = None):
+        self.threshold = threshold or max(1, int(_get_float_env("NUTRISLICE_BREAKER_THRESHOLD", DEFAULT_BREAKER_THRESHOLD)))
+        self.reset_seconds = (
+            _get_float_env("NUTRISLICE_BREAKER_RESET_SECONDS", DEFAULT_BREAKER_RESET_SECONDS)
+            if reset_seconds is None
+            else reset_seconds
+        )
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info("Nutrislice circuit breaker closed.")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_in_flight
+            self._trial_in_flight = False
+            if reopen or (self._opened_at is None and self._failures >= self.threshold):
+                if self._opened_at is None:
+                    logging.warning(
+                        f"Nutrislice circuit breaker opened after {self._failures} consecutive failures; "
+                        f"failing fast for {self.reset_seconds:.0f}s."
+                    )
+                self._opened_at = time.monotonic()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    Returns the process-wide breaker guarding Nutrislice requests.
+    """
+    global _breaker
+
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+
+    return _breaker
@@ -0,0 +1,220 @@
+import datetime
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, List, Optional, Set, Tuple
+
+from services.config import get_optional_path
+from services.metrics import get_run_metrics
+
+# Per-run record of who was emailed, so a crashed or killed send can resume.
+DEFAULT_LEDGER_PATH = Path(__file__).resolve().parents[1] / ".cache" / "send_ledger.sqlite3"
+SUPABASE_TABLE = "send_ledger"
+
+STATUS_DELIVERED = "delivered"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+# A killed run re-emails whoever was delivered but not yet flushed, so keep both small.
+DEFAULT_BATCH_SIZE = 50
+FLUSH_INTERVAL_SECONDS = 2
+REMOTE_CHUNK_SIZE = 500
+
+
+def get_ledger_path() -> Optional[Path]:
+    """SQLite send ledger (SEND_LEDGER_PATH), or None when resume tracking is off."""
+    return get_optional_path("SEND_LEDGER_PATH", DEFAULT_LEDGER_PATH)
+
+
+class SendLedger:
+    """
+    Records delivered, failed and skipped status per (send date, run kind, email).
+    Writes are buffered and committed every `batch_size` rows or FLUSH_INTERVAL_SECONDS,
+    whichever comes first (a background thread flushes even while no sends complete);
+    with `supabase` set, each committed batch is also upserted in bulk to the
+    send_ledger table, so a run killed mid-send (and its vanished runner disk) can
+    still be resumed from Supabase.
+    """
+
+    def __init__(
+        self,
+        send_date: datetime.date,
+        run_kind: str = "daily",
+        path: Optional[Path] = None,
+        supabase: Any = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.send_date = send_date.isoformat()
+        self.run_kind = run_kind
+        self.path = path or get_ledger_path() or DEFAULT_LEDGER_PATH
+        self.supabase = supabase
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, str, str, Optional[str], str]] = []
+        self._remote_pending: List[dict] = []
+        self._stop = threading.Event()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS send_ledger (
+                send_date TEXT NOT NULL,
+                run_kind TEXT NOT NULL,
+                email TEXT NOT NULL,
+                status TEXT NOT NULL,
+                detail TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (send_date, run_kind, email)
+            )
+            """
+        )
+        self._connection.commit()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="ledger-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        """
+        Flushes every FLUSH_INTERVAL_SECONDS, so rows recorded just before a slow
+        stretch (or a kill) do not wait for the next batch to fill.
+        """
+        while not self._stop.wait(FLUSH_INTERVAL_SECONDS):
+            try:
+                self._flush_all()
+            except sqlite3.Error as e:
+                logging.error(f"Failed to flush the send ledger: {e}")
+
+    def _flush_all(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+        # Outside the lock: delivery workers keep recording while the upsert is in flight.
+        if self.supabase is not None:
+            self.flush_remote()
+
+    def _delivered_rows(self, run_kind: Optional[str]) -> Set[Tuple[str, str]]:
+        """
+        (run kind, email) pairs delivered for this send date, locally or in Supabase,
+        for one run kind or, with `run_kind` None, all of them.
+        """
+        query = "SELECT run_kind, email FROM send_ledger WHERE send_date = ? AND status = ?"
+        params = [self.send_date, STATUS_DELIVERED]
+        if run_kind is not None:
+            query += " AND run_kind = ?"
+            params.append(run_kind)
+        with self._lock:
+            self._flush_locked()
+            delivered = set(self._connection.execute(query, params).fetchall())
+
+        if self.supabase is not None:
+            try:
+                start = 0
+                while True:
+                    request = (
+                        self.supabase.table(SUPABASE_TABLE)
+                        .select("run_kind,email")
+                        .eq("send_date", self.send_date)
+                        .eq("status", STATUS_DELIVERED)
+                    )
+                    if run_kind is not None:
+                        request = request.eq("run_kind", run_kind)
+                    with get_run_metrics().observe_time("supabase_query_seconds"):
+                        response = (
+                            request.order("email")
+                            .order("run_kind")
+                            .range(start, start + REMOTE_CHUNK_SIZE - 1)
+                            .execute()
+                        )
+                    rows = response.data or []
+                    delivered.update((row["run_kind"], row["email"]) for row in rows)
+                    if len(rows) < REMOTE_CHUNK_SIZE:
+                        break
+                    start += REMOTE_CHUNK_SIZE
+            except Exception as e:
+                logging.warning(f"Could not read delivered users from Supabase ledger: {e}")
+
+        return delivered
+
+    def delivered_emails(self) -> Set[str]:
+        """
+        Emails already delivered for this send date and run kind, locally or in Supabase.
+        """
+        return {email for _, email in self._delivered_rows(self.run_kind)}
+
+    def delivered_recipients(self) -> List[str]:
+        """
+        One email per message delivered on this send date by any run kind (daily,
+        updates), so a user sent both the daily menu and an update appears twice.
+        """
+        return [email for _, email in sorted(self._delivered_rows(None))]
+
+    def record(self, email: str, status: str, detail: Optional[str] = None) -> None:
+        updated_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self._lock:
+            self._pending.append((self.send_date, self.run_kind, email, status, detail, updated_at))
+            if self.supabase is not None:
+                self._remote_pending.append({
+                    "send_date": self.send_date,
+                    "run_kind": self.run_kind,
+                    "email": email,
+                    "status": status,
+                    "detail": detail,
+                    "updated_at": updated_at,
+                })
+
+            due = len(self._pending) >= self.batch_size
+
+        if due:
+            self._flush_all()
+
+    def _flush_locked(self) -> None:
+        if self._pending:
+            self._connection.executemany(
+                """
+                INSERT INTO send_ledger (send_date, run_kind, email, status, detail, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (send_date, run_kind, email) DO UPDATE SET
+                    status = excluded.status,
+                    detail = excluded.detail,
+                    updated_at = excluded.updated_at
+                """,
+                self._pending,
+            )
+            self._connection.commit()
+            self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def flush_remote(self) -> None:
+        """
+        Upserts buffered rows to the Supabase send_ledger table in bulk chunks.
+        """
+        with self._lock:
+            rows, self._remote_pending = self._remote_pending, []
+
+        for start in range(0, len(rows), REMOTE_CHUNK_SIZE):
+            chunk = rows[start:start + REMOTE_CHUNK_SIZE]
+            try:
+                with get_run_metrics().observe_time("supabase_query_seconds"):
+                    self.supabase.table(SUPABASE_TABLE).upsert(
+                        chunk,
+                        on_conflict="send_date,run_kind,email",
+                    ).execute()
+            except Exception as e:
+                logging.error(f"Failed to flush {len(chunk)} ledger row(s) to Supabase: {e}")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._flusher.join()
+        self._flush_all()
+        self._connection.close()
+
+    def __enter__(self) -> "SendLedger":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
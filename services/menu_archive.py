@@ -0,0 +1,256 @@
+"""
+Local history of parsed menus: every archived item in SQLite, with an FTS5 index over
+its normalized name words, so watchlist look-ahead and "when was X last served"
+queries run offline in milliseconds.
+
+    python -m services.menu_archive --from 2026-01-04 --to 2026-05-02   # backfill from Nutrislice
+    python -m services.menu_archive --search "cuban pork"
+"""
+
+import argparse
+import datetime
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from services import utils
+from services.config import bootstrap, get_optional_path
+
+DEFAULT_ARCHIVE_PATH = Path(__file__).resolve().parents[1] / ".cache" / "menu_archive.sqlite3"
+
+
+def get_archive_path() -> Optional[Path]:
+    """Menu history database (MENU_ARCHIVE_PATH), or None when archiving is off."""
+    return get_optional_path("MENU_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH)
+
+
+def _word_token(word: str) -> str:
+    """
+    Encodes a normalized word as one FTS token. Item words keep punctuation
+    ("pork," is a different word than "pork" in find_watchlist_hits), which any
+    FTS tokenizer would split on, so words are stored hex-encoded instead.
+    """
+    return "w" + word.encode("utf-8").hex()
+
+
+def build_match_query(term: str) -> Optional[str]:
+    """
+    FTS5 query equivalent to _term_matches_item_words: every word of `term` must
+    match one of its singular/plural forms. None when `term` has no words.
+    """
+    clauses = []
+    for term_word in " ".join(term.split()).lower().split():
+        variants = utils._normalize_word_forms(term_word)
+        if not variants:
+            return None
+        clauses.append("(" + " OR ".join(_word_token(variant) for variant in sorted(variants)) + ")")
+
+    return " AND ".join(clauses) or None
+
+
+class MenuArchive:
+    """
+    SQLite archive of parsed menu items with an FTS5 table over their word forms.
+    Storing a date replaces everything archived for it.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or get_archive_path() or DEFAULT_ARCHIVE_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS menu_items (
+                id INTEGER PRIMARY KEY,
+                menu_date TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                station TEXT NOT NULL,
+                name TEXT NOT NULL,
+                archived_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS menu_items_by_date ON menu_items (menu_date, meal);
+            CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts USING fts5(words);
+            """
+        )
+        self._connection.commit()
+
+    def store(self, menu_items: Iterable["utils.MenuItem"]) -> int:
+        """
+        Archives `menu_items`, replacing whatever was stored for their dates.
+        Returns the number of items written.
+        """
+        by_date: Dict[str, List["utils.MenuItem"]] = {}
+        for item in menu_items:
+            if item.date:
+                by_date.setdefault(item.date, []).append(item)
+        if not by_date:
+            return 0
+
+        archived_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        dates = [(date,) for date in sorted(by_date)]
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM menu_items_fts WHERE rowid IN (SELECT id FROM menu_items WHERE menu_date = ?)",
+                dates,
+            )
+            self._connection.executemany("DELETE FROM menu_items WHERE menu_date = ?", dates)
+            for date, items in sorted(by_date.items()):
+                for item in items:
+                    cursor = self._connection.execute(
+                        "INSERT INTO menu_items (menu_date, meal, station, name, archived_at) VALUES (?, ?, ?, ?, ?)",
+                        (date, item.meal, item.station, item.name, archived_at),
+                    )
+                    self._connection.execute(
+                        "INSERT INTO menu_items_fts (rowid, words) VALUES (?, ?)",
+                        (cursor.lastrowid, " ".join(_word_token(word) for word in sorted(item.words))),
+                    )
+
+        return sum(len(items) for items in by_date.values())
+
+    def date_range(self) -> Optional[tuple]:
+        """
+        (first, last) archived date as ISO strings, or None when the archive is empty.
+        """
+        first, last = self._connection.execute("SELECT MIN(menu_date), MAX(menu_date) FROM menu_items").fetchone()
+        return (first, last) if first else None
+
+    def items(self, start: datetime.date, end: datetime.date) -> List["utils.MenuItem"]:
+        """
+        Every archived item from `start` to `end` inclusive, sorted like sort_menu_items.
+        """
+        rows = self._connection.execute(
+            "SELECT menu_date, meal, station, name FROM menu_items WHERE menu_date BETWEEN ? AND ?",
+            (start.isoformat(), end.isoformat()),
+        ).fetchall()
+        return utils.sort_menu_items([utils.MenuItem(*row) for row in rows])
+
+    def search(
+        self,
+        term: str,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+        meals: Optional[Iterable[str]] = None,
+    ) -> List["utils.MenuItem"]:
+        """
+        Items whose names match watchlist `term` (same rules as find_watchlist_hits),
+        optionally limited to a date range and meals, sorted like sort_menu_items.
+        """
+        query = build_match_query(term)
+        if query is None:
+            return []
+
+        sql = (
+            "SELECT i.menu_date, i.meal, i.station, i.name FROM menu_items_fts "
+            "JOIN menu_items AS i ON i.id = menu_items_fts.rowid WHERE menu_items_fts MATCH ?"
+        )
+        params: List[Any] = [query]
+        if start is not None:
+            sql += " AND i.menu_date >= ?"
+            params.append(start.isoformat())
+        if end is not None:
+            sql += " AND i.menu_date <= ?"
+            params.append(end.isoformat())
+        meal_filter = sorted({meal.lower() for meal in meals or [] if isinstance(meal, str) and meal.strip()})
+        if meal_filter:
+            sql += f" AND i.meal IN ({', '.join('?' for _ in meal_filter)})"
+            params.extend(meal_filter)
+
+        rows = self._connection.execute(sql, params).fetchall()
+        return utils.sort_menu_items(list(dict.fromkeys(utils.MenuItem(*row) for row in rows)))
+
+    def find_watchlist_hits(
+        self,
+        preferences: Dict[str, Any],
+        start: datetime.date,
+        end: datetime.date,
+    ) -> List["utils.MenuItem"]:
+        """
+        find_watchlist_hits over any archived date range instead of a fetched window.
+        """
+        hits = {
+            item
+            for term in utils.get_watchlist_terms(preferences)
+            for item in self.search(term, start, end, preferences.get("meals", []))
+        }
+        return utils.sort_menu_items(list(hits))
+
+    def next_served(self, term: str, on_or_after: datetime.date, meals: Optional[Iterable[str]] = None) -> List["utils.MenuItem"]:
+        """
+        Matches on the first archived date on or after `on_or_after` that has any.
+        """
+        hits = self.search(term, start=on_or_after, meals=meals)
+        return [item for item in hits if item.date == hits[0].date] if hits else []
+
+    def last_served(self, term: str, before: datetime.date, meals: Optional[Iterable[str]] = None) -> List["utils.MenuItem"]:
+        """
+        Matches on the last archived date before `before` that has any.
+        """
+        hits = self.search(term, end=before - datetime.timedelta(days=1), meals=meals)
+        return [item for item in hits if item.date == hits[-1].date] if hits else []
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "MenuArchive":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
+
+
+def archive_menu_items(menu_items: Iterable["utils.MenuItem"]) -> int:
+    """
+    Stores parsed items in the default archive; a no-op when MENU_ARCHIVE_PATH is off.
+    Archiving never fails the caller: errors are logged and 0 is returned.
+    """
+    path = get_archive_path()
+    if path is None:
+        return 0
+
+    try:
+        with MenuArchive(path) as archive:
+            return archive.store(menu_items)
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Failed to archive menu items in {path}: {e}")
+        return 0
+
+
+def backfill(start: datetime.date, end: datetime.date) -> int:
+    """
+    Fetches every Nutrislice week from `start` to `end` and archives complete, fresh weeks.
+    """
+    dates = [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+    stored = 0
+    for week_start, weekly_menu in utils.fetch_menu_weeks(dates).items():
+        if not all(weekly_menu.values()) or any(utils.is_stale(payload) for payload in weekly_menu.values()):
+            logging.warning(f"Incomplete or stale Nutrislice data for the week of {week_start}; not archived.")
+            continue
+        stored += archive_menu_items(utils.parse_menu(weekly_menu))
+    return stored
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill or search the local menu archive.")
+    parser.add_argument("--from", dest="start", help="Backfill from this date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="Backfill through this date, YYYY-MM-DD (default: --from)")
+    parser.add_argument("--search", help="Print every archived serving of this watchlist term")
+    args = parser.parse_args()
+
+    if args.start:
+        start = datetime.date.fromisoformat(args.start)
+        end = datetime.date.fromisoformat(args.end) if args.end else start
+        logging.info(f"Archived {backfill(start, end)} menu item(s) from {start} to {end}.")
+
+    with MenuArchive() as archive:
+        if args.search:
+            for item in archive.search(args.search):
+                print(f"{item.date} | {item.meal.capitalize()} | {item.station} | {item.name}")
+        date_range = archive.date_range()
+        logging.info(f"Archive {archive.path} covers {date_range[0]} to {date_range[1]}." if date_range else "Archive is empty.")
+
+
+if __name__ == "__main__":
+    bootstrap()
+    main()
@@ -0,0 +1,270 @@
+"""
+Menu build step: turns raw Nutrislice week payloads into one compact, versioned JSON
+artifact per week, parsed, sorted and grouped by date, meal and station.
+
+The sender reads fresh local artifacts in fetch_menu_range; the web app reads them from
+MENU_ARTIFACT_URL (see web/lib/menu.ts). Both fall back to the live Nutrislice fetch.
+
+    python -m services.menu_artifact --date 2026-04-13 --upload
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from services import menu_archive, utils
+from services.config import bootstrap, create_supabase_client, get_optional_path
+
+ARTIFACT_VERSION = 1
+DEFAULT_ARTIFACT_DIR = Path(__file__).resolve().parents[1] / ".cache" / "menu_artifacts"
+DEFAULT_MAX_AGE_SECONDS = 60 * 60
+
+NUTRITION_FIELDS = [
+    "calories", "g_fat", "g_saturated_fat", "g_trans_fat", "mg_cholesterol", "mg_sodium",
+    "g_carbs", "g_fiber", "g_sugar", "g_added_sugar", "g_protein", "mg_calcium",
+    "mg_iron", "mg_potassium", "mg_vitamin_c", "mg_vitamin_d",
+]
+
+
+def get_artifact_dir() -> Optional[Path]:
+    """Local artifact directory (MENU_ARTIFACT_DIR), or None when artifacts are off."""
+    return get_optional_path("MENU_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR)
+
+
+def get_max_age_seconds() -> int:
+    """
+    Returns how old an artifact may be before readers fetch upstream instead.
+    Configurable with MENU_ARTIFACT_MAX_AGE_SECONDS.
+    """
+    try:
+        return max(0, int(os.getenv("MENU_ARTIFACT_MAX_AGE_SECONDS", DEFAULT_MAX_AGE_SECONDS)))
+    except ValueError:
+        return DEFAULT_MAX_AGE_SECONDS
+
+
+def artifact_filename(week_start: datetime.date) -> str:
+    return f"menu-week-{week_start.isoformat()}.json"
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            number = float(value.strip())
+        except ValueError:
+            return None
+        return int(number) if number.is_integer() else number
+    return None
+
+
+def _strip_or_none(value: Any) -> Optional[str]:
+    return value.strip() or None if isinstance(value, str) else None
+
+
+def _normalize_food(name: str, food: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The per-item fields web/lib/menu.ts shows, with null and empty values left out
+    (including individual nutritionInfo fields) to keep the artifact small.
+    `name` is the trimmed name from iter_menu_foods.
+    """
+    entry: Dict[str, Any] = {"name": name}
+
+    nutrition = food.get("rounded_nutrition_info") or {}
+    calories = _to_number(nutrition.get("calories"))
+    if calories is not None:
+        entry["calories"] = calories
+
+    nutrition_info = {field: _to_number(nutrition.get(field)) for field in NUTRITION_FIELDS}
+    nutrition_info = {field: value for field, value in nutrition_info.items() if value is not None}
+    if nutrition_info:
+        entry["nutritionInfo"] = nutrition_info
+
+    ingredients = _strip_or_none(food.get("ingredients"))
+    if ingredients:
+        entry["ingredients"] = ingredients
+
+    icons = [
+        {
+            "name": _strip_or_none(icon.get("name")) or "Food icon",
+            "slug": _strip_or_none(icon.get("slug")),
+            "helpText": _strip_or_none(icon.get("help_text")),
+            "customIconUrl": _strip_or_none(icon.get("custom_icon_url")),
+        }
+        for icon in ((food.get("icons") or {}).get("food_icons") or [])
+        if icon.get("custom_icon_url") or icon.get("name")
+    ]
+    if icons:
+        entry["icons"] = icons
+
+    serving_size = food.get("serving_size_info") or {}
+    amount = _strip_or_none(serving_size.get("serving_size_amount"))
+    unit = _strip_or_none(serving_size.get("serving_size_unit"))
+    if amount or unit:
+        entry["servingSize"] = {"amount": amount, "unit": unit}
+
+    return entry
+
+
+def build_week_artifact(week_start: datetime.date, weekly_menu: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds the artifact for one week from raw payloads keyed by meal type:
+    {"version", "week_start", "generated_at", "days": {date: [{"meal", "stations":
+    [{"station", "items": [...]}]}]}}, ordered like MenuItem.sort_key.
+    """
+    entries = []
+    for date, meal, station, name, food in utils.iter_menu_foods(weekly_menu):
+        item = utils.MenuItem(date, meal, station, name)
+        entries.append((item.sort_key, item, _normalize_food(name, food)))
+    entries.sort(key=lambda entry: entry[0])
+
+    days: Dict[str, List[Dict[str, Any]]] = {}
+    for _, item, food_entry in entries:
+        meals = days.setdefault(item.date, [])
+        if not meals or meals[-1]["meal"] != item.meal:
+            meals.append({"meal": item.meal, "stations": []})
+        stations = meals[-1]["stations"]
+        if not stations or stations[-1]["station"] != item.station:
+            stations.append({"station": item.station, "items": []})
+        stations[-1]["items"].append(food_entry)
+
+    return {
+        "version": ARTIFACT_VERSION,
+        "week_start": week_start.isoformat(),
+        "generated_at": time.time(),
+        "days": days,
+    }
+
+
+def write_artifact(artifact: Dict[str, Any], directory: Optional[Path] = None) -> Optional[Path]:
+    """
+    Atomically writes `artifact` as minified JSON. Returns its path, or None when disabled.
+    """
+    directory = directory or get_artifact_dir()
+    if directory is None:
+        return None
+
+    path = directory / artifact_filename(datetime.date.fromisoformat(artifact["week_start"]))
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(artifact, handle, separators=(",", ":"), ensure_ascii=False)
+    os.replace(temp_path, path)
+    return path
+
+
+def load_artifact(week_start: datetime.date, max_age_seconds: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Loads the local artifact for a week if it exists, has this ARTIFACT_VERSION
+    and is younger than `max_age_seconds` (default get_max_age_seconds()).
+    """
+    directory = get_artifact_dir()
+    if directory is None:
+        return None
+
+    path = directory / artifact_filename(week_start)
+    try:
+        with open(path, encoding="utf-8") as handle:
+            artifact = json.load(handle)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable menu artifact {path}: {e}")
+        return None
+
+    if not isinstance(artifact, dict) or artifact.get("version") != ARTIFACT_VERSION:
+        return None
+
+    max_age = get_max_age_seconds() if max_age_seconds is None else max_age_seconds
+    if time.time() - (artifact.get("generated_at") or 0) >= max_age:
+        return None
+
+    return artifact
+
+
+def artifact_menu_items(artifact: Dict[str, Any], date_key: str) -> List["utils.MenuItem"]:
+    """
+    Returns the sorted MenuItems for one date of an artifact.
+    """
+    return [
+        utils.MenuItem(date_key, meal_entry["meal"], station_entry["station"], food_entry["name"])
+        for meal_entry in artifact.get("days", {}).get(date_key, [])
+        for station_entry in meal_entry["stations"]
+        for food_entry in station_entry["items"]
+    ]
+
+
+def build_artifacts(dates: Iterable[datetime.date], directory: Optional[Path] = None) -> List[Path]:
+    """
+    Fetches the weeks covering `dates` (through the snapshot cache) and writes one artifact each.
+    Weeks where a meal failed or was served stale are skipped, so readers fall back
+    to a live fetch instead of trusting an old menu as fresh. Written weeks are also
+    added to the local menu archive.
+    """
+    paths = []
+    for week_start, weekly_menu in utils.fetch_menu_weeks(dates).items():
+        if not all(weekly_menu.values()) or any(utils.is_stale(payload) for payload in weekly_menu.values()):
+            logging.warning(f"Incomplete or stale Nutrislice data for the week of {week_start}; artifact not written.")
+            continue
+        menu_archive.archive_menu_items(utils.parse_menu(weekly_menu))
+        path = write_artifact(build_week_artifact(week_start, weekly_menu), directory)
+        if path:
+            paths.append(path)
+    return paths
+
+
+def upload_artifacts(paths: Iterable[Path]) -> int:
+    """
+    Uploads artifacts to the Supabase Storage bucket named by MENU_ARTIFACT_BUCKET,
+    overwriting earlier builds. Returns the number uploaded.
+    """
+    bucket = os.getenv("MENU_ARTIFACT_BUCKET")
+    supabase = create_supabase_client() if bucket else None
+    if supabase is None:
+        logging.info("MENU_ARTIFACT_BUCKET or Supabase credentials not set; skipping artifact upload.")
+        return 0
+
+    storage = supabase.storage.from_(bucket)
+    uploaded = 0
+    for path in paths:
+        try:
+            storage.upload(
+                path.name,
+                path.read_bytes(),
+                {"content-type": "application/json", "cache-control": "300", "upsert": "true"},
+            )
+            uploaded += 1
+        except Exception as e:
+            logging.error(f"Failed to upload menu artifact {path.name}: {e}")
+    return uploaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build per-week menu artifacts from Nutrislice.")
+    parser.add_argument("--date", help="First date to cover, YYYY-MM-DD (default: today)")
+    parser.add_argument("--days", type=int, default=3, help="Number of days to cover (default: 3)")
+    parser.add_argument("--out", type=Path, help="Output directory (default: MENU_ARTIFACT_DIR)")
+    parser.add_argument("--upload", action="store_true", help="Also upload to the MENU_ARTIFACT_BUCKET Supabase bucket")
+    args = parser.parse_args()
+
+    start_date = datetime.datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else datetime.date.today()
+    dates = [start_date + datetime.timedelta(days=offset) for offset in range(max(1, args.days))]
+    paths = build_artifacts(dates, args.out)
+    for path in paths:
+        logging.info(f"Wrote menu artifact {path}")
+
+    if args.upload:
+        logging.info(f"Uploaded {upload_artifacts(paths)} menu artifact(s).")
+
+
+if __name__ == "__main__":
+    bootstrap()
+    main()
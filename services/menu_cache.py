@@ -0,0 +1,127 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from services.config import get_optional_path
+
+# Snapshots of raw Nutrislice week payloads, one gzip file per (meal, week).
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache" / "nutrislice"
+DEFAULT_TTL_SECONDS = 30 * 60
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Snapshot directory (MENU_CACHE_DIR), or None when snapshot caching is off."""
+    return get_optional_path("MENU_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def is_cache_dir_configured() -> bool:
+    """
+    True when MENU_CACHE_DIR names a directory explicitly. The default lives in the
+    checkout, which CI runners discard, so only an explicit (persisted or shared)
+    directory is worth filling ahead of time.
+    """
+    return os.getenv("MENU_CACHE_DIR") is not None and get_cache_dir() is not None
+
+
+def get_ttl_seconds() -> int:
+    """
+    Returns how long a snapshot without ETag/Last-Modified is trusted without a request.
+    Configurable with MENU_CACHE_TTL_SECONDS.
+    """
+    try:
+        return max(0, int(os.getenv("MENU_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)))
+    except ValueError:
+        return DEFAULT_TTL_SECONDS
+
+
+def _snapshot_path(cache_dir: Path, meal: str, week_start: datetime.date) -> Path:
+    return cache_dir / f"{week_start.isoformat()}-{meal}.json.gz"
+
+
+def load_snapshot(meal: str, week_start: datetime.date) -> Optional[Dict[str, Any]]:
+    """
+    Loads the stored snapshot for a (meal, week).
+    Returns a dict with data, etag, last_modified and fetched_at, or None.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+
+    path = _snapshot_path(cache_dir, meal, week_start)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            snapshot = json.load(handle)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable menu snapshot {path}: {e}")
+        return None
+
+    if not isinstance(snapshot, dict) or "data" not in snapshot:
+        return None
+
+    return snapshot
+
+
+def save_snapshot(
+    meal: str,
+    week_start: datetime.date,
+    data: Dict[str, Any],
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> None:
+    """
+    Atomically writes a (meal, week) snapshot so concurrent readers never see a partial file.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return
+
+    snapshot = {
+        "meal": meal,
+        "week_start": week_start.isoformat(),
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": time.time(),
+        "data": data,
+    }
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw_handle:
+            with gzip.GzipFile(fileobj=raw_handle, mode="wb") as handle:
+                handle.write(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+        os.replace(temp_path, _snapshot_path(cache_dir, meal, week_start))
+    except OSError as e:
+        logging.warning(f"Failed to write menu snapshot for {meal} week of {week_start}: {e}")
+
+
+def has_validators(snapshot: Dict[str, Any]) -> bool:
+    return bool(snapshot.get("etag") or snapshot.get("last_modified"))
+
+
+def is_fresh(snapshot: Dict[str, Any]) -> bool:
+    """
+    True when a snapshot without validators is still inside its TTL.
+    """
+    fetched_at = snapshot.get("fetched_at") or 0
+    return time.time() - fetched_at < get_ttl_seconds()
+
+
+def get_conditional_headers(snapshot: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    if not snapshot:
+        return {}
+
+    headers = {}
+    if snapshot.get("etag"):
+        headers["If-None-Match"] = snapshot["etag"]
+    if snapshot.get("last_modified"):
+        headers["If-Modified-Since"] = snapshot["last_modified"]
+    return headers
@@ -0,0 +1,237 @@
+import datetime
+import hashlib
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.config import get_optional_path
+from services.metrics import get_run_metrics
+from services.utils import MenuItem
+
+# Per-(date, meal, station) content hashes of the last menu that was sent, so an
+# update run can tell which stations changed after the daily send.
+DEFAULT_STATE_PATH = Path(__file__).resolve().parents[1] / ".cache" / "menu_state.sqlite3"
+SUPABASE_TABLE = "menu_state"
+REMOTE_CHUNK_SIZE = 500
+
+StationKey = Tuple[str, str, str]
+# (content hash, sorted item names)
+StationState = Tuple[str, Tuple[str, ...]]
+
+
+def get_state_path() -> Optional[Path]:
+    """Menu state database that --update diffs against (MENU_STATE_PATH), or None when off."""
+    return get_optional_path("MENU_STATE_PATH", DEFAULT_STATE_PATH)
+
+
+def _hash_names(names: Iterable[str]) -> str:
+    return hashlib.sha256("\n".join(names).encode("utf-8")).hexdigest()
+
+
+def station_hashes(menu_items: Iterable[MenuItem]) -> Dict[StationKey, StationState]:
+    """
+    Groups parsed items by (date, meal, station) and hashes each group's sorted names.
+    """
+    names: Dict[StationKey, List[str]] = {}
+    for item in menu_items:
+        if item.date:
+            names.setdefault((item.date, item.meal, item.station), []).append(item.name)
+
+    state = {}
+    for key, station_names in names.items():
+        ordered = tuple(sorted(station_names))
+        state[key] = (_hash_names(ordered), ordered)
+    return state
+
+
+def fingerprint(state: Dict[StationKey, StationState]) -> str:
+    """
+    One hash over a whole menu state, e.g. to tell one update run's menu from the next.
+    """
+    return _hash_names(f"{date}|{meal}|{station}|{state[(date, meal, station)][0]}" for date, meal, station in sorted(state))
+
+
+def diff_menu_state(
+    previous: Dict[StationKey, StationState],
+    current: Dict[StationKey, StationState],
+) -> List[StationKey]:
+    """
+    Returns the stations added, removed or changed between two states.
+    Only dates present in both are compared: a date with no stored menu has no
+    baseline, and a date that came back empty is more likely an upstream outage
+    than a cancelled menu.
+    """
+    dates = {key[0] for key in previous} & {key[0] for key in current}
+    keys = {key for key in previous.keys() | current.keys() if key[0] in dates}
+    return sorted(
+        key for key in keys
+        if previous.get(key, ("",))[0] != current.get(key, ("",))[0]
+    )
+
+
+def restore_menu_items(state: Dict[StationKey, StationState]) -> List[MenuItem]:
+    """
+    Rebuilds the MenuItems a stored state was hashed from.
+    """
+    return [
+        MenuItem(date, meal, station, name)
+        for (date, meal, station), (_, names) in state.items()
+        for name in names
+    ]
+
+
+def baseline_items(
+    previous: Dict[StationKey, StationState],
+    current_items: Iterable[MenuItem],
+) -> List[MenuItem]:
+    """
+    The menu as it was last sent: stored items for dates diff_menu_state compares,
+    current items for the rest, so uncompared dates never count as changed.
+    """
+    current_items = list(current_items)
+    compared_dates = {key[0] for key in previous} & {item.date for item in current_items if item.date}
+    return [
+        *restore_menu_items({key: value for key, value in previous.items() if key[0] in compared_dates}),
+        *(item for item in current_items if item.date not in compared_dates),
+    ]
+
+
+class MenuStateStore:
+    """
+    SQLite table of station hashes and item names per menu date.
+    Saving a date replaces everything stored for it. With `supabase` set, states are
+    also written to the menu_state table, and dates stored there take precedence on
+    load, so an --update on a fresh CI runner still finds the daily send's baseline.
+    """
+
+    def __init__(self, path: Optional[Path] = None, supabase: Any = None):
+        self.path = path or get_state_path() or DEFAULT_STATE_PATH
+        self.supabase = supabase
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS menu_state (
+                menu_date TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                station TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                item_names TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (menu_date, meal, station)
+            )
+            """
+        )
+        self._connection.commit()
+
+    def load(self, dates: Iterable[str]) -> Dict[StationKey, StationState]:
+        dates = list(dates)
+        if not dates:
+            return {}
+
+        rows = self._connection.execute(
+            f"""
+            SELECT menu_date, meal, station, content_hash, item_names FROM menu_state
+            WHERE menu_date IN ({", ".join("?" for _ in dates)})
+            """,
+            dates,
+        ).fetchall()
+        state = {
+            (menu_date, meal, station): (content_hash, tuple(json.loads(item_names)))
+            for menu_date, meal, station, content_hash, item_names in rows
+        }
+
+        if self.supabase is not None:
+            remote = self._load_remote(dates)
+            remote_dates = {key[0] for key in remote}
+            state = {key: value for key, value in state.items() if key[0] not in remote_dates}
+            state.update(remote)
+
+        return state
+
+    def _load_remote(self, dates: List[str]) -> Dict[StationKey, StationState]:
+        state: Dict[StationKey, StationState] = {}
+        try:
+            start = 0
+            while True:
+                with get_run_metrics().observe_time("supabase_query_seconds"):
+                    response = (
+                        self.supabase.table(SUPABASE_TABLE)
+                        .select("menu_date,meal,station,content_hash,item_names")
+                        .in_("menu_date", dates)
+                        .order("menu_date")
+                        .order("meal")
+                        .order("station")
+                        .range(start, start + REMOTE_CHUNK_SIZE - 1)
+                        .execute()
+                    )
+                rows = response.data or []
+                state.update(
+                    ((row["menu_date"], row["meal"], row["station"]), (row["content_hash"], tuple(row["item_names"])))
+                    for row in rows
+                )
+                if len(rows) < REMOTE_CHUNK_SIZE:
+                    break
+                start += REMOTE_CHUNK_SIZE
+        except Exception as e:
+            logging.warning(f"Could not read menu state from Supabase: {e}")
+        return state
+
+    def save(self, state: Dict[StationKey, StationState]) -> None:
+        """
+        Replaces the stored stations for every date in `state`.
+        Dates without items are left alone, so an empty upstream response never
+        overwrites a good baseline.
+        """
+        dates = sorted({key[0] for key in state})
+        if not dates:
+            return
+
+        updated_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self._connection:
+            self._connection.executemany("DELETE FROM menu_state WHERE menu_date = ?", [(date,) for date in dates])
+            self._connection.executemany(
+                """
+                INSERT INTO menu_state (menu_date, meal, station, content_hash, item_names, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (date, meal, station, content_hash, json.dumps(list(names)), updated_at)
+                    for (date, meal, station), (content_hash, names) in sorted(state.items())
+                ],
+            )
+        if self.supabase is not None:
+            self._save_remote(dates, state, updated_at)
+        logging.info(f"Stored menu hashes for {len(state)} station(s) across {len(dates)} date(s).")
+
+    def _save_remote(self, dates: List[str], state: Dict[StationKey, StationState], updated_at: str) -> None:
+        rows = [
+            {
+                "menu_date": date,
+                "meal": meal,
+                "station": station,
+                "content_hash": content_hash,
+                "item_names": list(names),
+                "updated_at": updated_at,
+            }
+            for (date, meal, station), (content_hash, names) in sorted(state.items())
+        ]
+        try:
+            with get_run_metrics().observe_time("supabase_query_seconds"):
+                self.supabase.table(SUPABASE_TABLE).delete().in_("menu_date", dates).execute()
+                for start in range(0, len(rows), REMOTE_CHUNK_SIZE):
+                    self.supabase.table(SUPABASE_TABLE).insert(rows[start:start + REMOTE_CHUNK_SIZE]).execute()
+        except Exception as e:
+            logging.error(f"Failed to store menu state in Supabase: {e}")
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "MenuStateStore":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
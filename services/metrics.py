@@ -0,0 +1,304 @@
+import cProfile
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from services.config import get_optional_path, is_disabled
+
+# Observations keep exact count/sum/min/max and a bounded sample for percentiles.
+MAX_SAMPLES = 10000
+PROMETHEUS_PREFIX = "daily_menu"
+
+_run_metrics: Optional["RunMetrics"] = None
+_run_metrics_lock = threading.Lock()
+
+
+class StageTimer:
+    """
+    Accumulates wall time and call counts per pipeline stage.
+    Safe to use from worker threads; stages that run in parallel add up their own time.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + count
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def report_lines(self) -> List[str]:
+        with self._lock:
+            stages = list(self.totals.items())
+            counts = dict(self.counts)
+
+        lines = [f"{'stage':<16}{'calls':>9}{'total s':>11}{'avg ms':>10}{'per s':>10}"]
+        for stage, total in stages:
+            count = counts.get(stage, 0)
+            average_ms = total / count * 1000 if count else 0.0
+            per_second = count / total if total else 0.0
+            lines.append(f"{stage:<16}{count:>9}{total:>11.3f}{average_ms:>10.2f}{per_second:>10.1f}")
+        lines.append(f"{'end-to-end':<16}{'':>9}{self.elapsed():>11.3f}")
+        return lines
+
+    def log_report(self) -> None:
+        for line in self.report_lines():
+            logging.info(line)
+
+
+class RunMetrics(StageTimer):
+    """
+    Stage timings plus per-event observations (latency, sizes), counters and peak memory
+    for one send run. Summaries are written as JSON and, optionally, a Prometheus textfile.
+    """
+
+    def __init__(self, track_memory: bool = False):
+        super().__init__()
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.finished_seconds: Optional[float] = None
+        self.observations: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, int] = {}
+        self.info: Dict[str, Any] = {}
+        self.peak_memory_bytes: Optional[int] = None
+        self._random = random.Random(0)
+        self._owns_tracemalloc = False
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            observation = self.observations.get(name)
+            if observation is None:
+                observation = {"count": 0, "sum": 0, "min": value, "max": value, "samples": []}
+                self.observations[name] = observation
+
+            observation["count"] += 1
+            observation["sum"] += value
+            observation["min"] = min(observation["min"], value)
+            observation["max"] = max(observation["max"], value)
+            samples = observation["samples"]
+            if len(samples) < MAX_SAMPLES:
+                samples.append(value)
+            else:
+                slot = self._random.randrange(observation["count"])
+                if slot < MAX_SAMPLES:
+                    samples[slot] = value
+
+    @contextmanager
+    def observe_time(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_info(self, **fields: Any) -> None:
+        with self._lock:
+            self.info.update(fields)
+
+    def finish(self) -> None:
+        """
+        Freezes the end-to-end time and records the tracemalloc peak.
+        """
+        if self.finished_seconds is None:
+            self.finished_seconds = self.elapsed()
+        if tracemalloc.is_tracing():
+            self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+
+    @staticmethod
+    def _percentile(samples: List[float], fraction: float) -> float:
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                stage: {"calls": self.counts.get(stage, 0), "total_seconds": round(total, 6)}
+                for stage, total in self.totals.items()
+            }
+            observations = {}
+            for name, observation in self.observations.items():
+                samples = observation["samples"]
+                observations[name] = {
+                    "count": observation["count"],
+                    "sum": round(observation["sum"], 6),
+                    "min": round(observation["min"], 6),
+                    "max": round(observation["max"], 6),
+                    "mean": round(observation["sum"] / observation["count"], 6),
+                    "p50": round(self._percentile(samples, 0.5), 6),
+                    "p95": round(self._percentile(samples, 0.95), 6),
+                }
+            counters = dict(self.counters)
+            info = dict(self.info)
+
+        return {
+            "started_at": self.started_at.isoformat(),
+            "end_to_end_seconds": round(self.finished_seconds or self.elapsed(), 6),
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "run": info,
+            "stages": stages,
+            "observations": observations,
+            "counters": counters,
+        }
+
+    def prometheus_lines(self) -> List[str]:
+        summary = self.summary()
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_run_duration_seconds {summary['end_to_end_seconds']}",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {self.started_at.timestamp():.0f}",
+        ]
+        if summary["peak_memory_bytes"] is not None:
+            lines += [
+                f"# TYPE {PROMETHEUS_PREFIX}_peak_memory_bytes gauge",
+                f"{PROMETHEUS_PREFIX}_peak_memory_bytes {summary['peak_memory_bytes']}",
+            ]
+
+        if summary["stages"]:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds gauge")
+            for stage, values in summary["stages"].items():
+                lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds{{stage="{stage}"}} {values["total_seconds"]}')
+
+        for name, values in summary["observations"].items():
+            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}"
+            lines += [
+                f"# TYPE {metric} summary",
+                f'{metric}{{quantile="0.5"}} {values["p50"]}',
+                f'{metric}{{quantile="0.95"}} {values["p95"]}',
+                f"{metric}_sum {values['sum']}",
+                f"{metric}_count {values['count']}",
+            ]
+
+        for name, value in summary["counters"].items():
+            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        return lines
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        handle.write(text)
+    os.replace(temp_path, path)
+
+
+
+def get_metrics_path() -> Optional[Path]:
+    """JSON run summary destination, from RUN_METRICS_PATH (unset = not written)."""
+    return get_optional_path("RUN_METRICS_PATH")
+
+
+def get_prometheus_path() -> Optional[Path]:
+    """Prometheus textfile-collector destination, from RUN_METRICS_PROM_PATH."""
+    return get_optional_path("RUN_METRICS_PROM_PATH")
+
+
+def get_profile_path() -> Optional[Path]:
+    """cProfile output path, from SEND_MENU_PROFILE (unset = no profiling)."""
+    return get_optional_path("SEND_MENU_PROFILE")
+
+
+def get_run_metrics() -> RunMetrics:
+    """
+    Returns the process-wide metrics that library code records into.
+    """
+    global _run_metrics
+
+    with _run_metrics_lock:
+        if _run_metrics is None:
+            _run_metrics = RunMetrics()
+
+    return _run_metrics
+
+
+def start_run_metrics() -> RunMetrics:
+    """
+    Replaces the process-wide metrics with a fresh instance for a new run.
+    Peak memory is tracked with tracemalloc when a summary will be written,
+    unless RUN_METRICS_TRACEMALLOC is off.
+    """
+    global _run_metrics
+
+    track_memory = (
+        (get_metrics_path() is not None or get_prometheus_path() is not None)
+        and not is_disabled(os.getenv("RUN_METRICS_TRACEMALLOC", "1"))
+    )
+    with _run_metrics_lock:
+        _run_metrics = RunMetrics(track_memory=track_memory)
+
+    return _run_metrics
+
+
+def write_run_metrics(metrics: RunMetrics) -> None:
+    """
+    Finishes `metrics` and writes the JSON summary and Prometheus textfile when configured.
+    """
+    metrics.finish()
+
+    json_path = get_metrics_path()
+    prometheus_path = get_prometheus_path()
+    try:
+        if json_path:
+            _write_atomic(json_path, json.dumps(metrics.summary(), indent=2) + "\n")
+            logging.info(f"Wrote run metrics to {json_path}")
+        if prometheus_path:
+            _write_atomic(prometheus_path, "\n".join(metrics.prometheus_lines()) + "\n")
+            logging.info(f"Wrote Prometheus metrics to {prometheus_path}")
+    except OSError as e:
+        logging.error(f"Failed to write run metrics: {e}")
+
+
+def run_profiled(func: Callable[[], Any], profile_path: Optional[Path] = None) -> Any:
+    """
+    Calls `func`, under cProfile when `profile_path` is set, saving the stats there.
+    Inspect with `python -m pstats <path>` or snakeviz.
+    """
+    if profile_path is None:
+        return func()
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profile_path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(profile_path))
+        logging.info(f"Saved cProfile stats to {profile_path}")
@@ -1,37 +1,316 @@
-import requests
+import os
+import re
+import sys
+import threading
+import time
 import datetime
-from typing import List, Dict, Any, Optional
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from services import menu_artifact, menu_cache
+from services.fetch_policy import RETRYABLE_STATUSES, Deadline, backoff_seconds, get_circuit_breaker, get_max_attempts
+from services.metrics import get_run_metrics
+
+if TYPE_CHECKING:
+    import requests
 
 # Constants
 BASE_URL = "https://dickinson.api.nutrislice.com/menu/api/weeks/school/the-caf/menu-type"
 MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+REQUEST_TIMEOUT_SECONDS = 10
+DEFAULT_FETCH_CONCURRENCY = 6
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+def get_base_url() -> str:
+    """
+    Returns the Nutrislice menu-type endpoint, overridable with NUTRISLICE_BASE_URL
+    (e.g. to point at a local replay server).
+    """
+    return os.getenv("NUTRISLICE_BASE_URL", BASE_URL).rstrip("/")
 
 def get_nutrislice_url(date: datetime.date, meal_type: str) -> str:
     """
     Generates the dynamic URL for the Nutrislice API based on date and meal type.
     Format: .../menu-type/{meal_type}/{year}/{month}/{day}/
     """
-    return f"{BASE_URL}/{meal_type}/{date.year}/{date.month:02d}/{date.day:02d}/"
+    return f"{get_base_url()}/{meal_type}/{date.year}/{date.month:02d}/{date.day:02d}/"
 
-def fetch_menu_data(date: datetime.date) -> Dict[str, Any]:
+def get_week_start(date: datetime.date) -> datetime.date:
     """
-    Fetches menu data for all meal types for a given date.
-    Returns a dictionary keyed by meal type.
+    Returns the Sunday that starts the Nutrislice week containing `date`.
+    The /weeks/ endpoint returns the same Sunday-Saturday payload for every day in it.
     """
-    daily_menu = {}
-    
-    for meal in MEAL_TYPES:
-        url = get_nutrislice_url(date, meal)
+    return date - datetime.timedelta(days=(date.weekday() + 1) % 7)
+
+def get_fetch_concurrency() -> int:
+    """
+    Returns the maximum number of Nutrislice requests in flight at once.
+    Configurable with NUTRISLICE_MAX_CONCURRENCY.
+    """
+    try:
+        concurrency = int(os.getenv("NUTRISLICE_MAX_CONCURRENCY", DEFAULT_FETCH_CONCURRENCY))
+    except ValueError:
+        concurrency = DEFAULT_FETCH_CONCURRENCY
+
+    return max(1, concurrency)
+
+def get_http_session() -> "requests.Session":
+    """
+    Returns the shared keep-alive session used for every Nutrislice request.
+    The connection pool is sized to the fetch concurrency so parallel requests reuse sockets.
+    requests is imported on first use; parsing and rendering never need it.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            pool_size = get_fetch_concurrency()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+
+    return _session
+
+class StalePayload(dict):
+    """
+    A payload served from the last good snapshot because the live fetch failed.
+    Behaves like the payload dict; `fetched_at` is when that snapshot was taken.
+    """
+
+    def __init__(self, data: Dict[str, Any], fetched_at: Optional[float]):
+        super().__init__(data)
+        self.fetched_at = fetched_at
+
+def is_stale(payload: Any) -> bool:
+    return isinstance(payload, StalePayload)
+
+def _fetch_meal_payload(
+    meal: str,
+    date: datetime.date,
+    deadline: Optional[Deadline] = None,
+    fresh: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Fetches one (meal, week) payload, retrying transient failures with jittered backoff
+    while `deadline` allows and the circuit breaker is closed. When every attempt fails,
+    the last good snapshot is returned as a StalePayload, or None if there is none.
+    With `fresh`, a TTL-fresh snapshot is still revalidated upstream instead of reused.
+    """
+    import requests
+
+    metrics = get_run_metrics()
+    week_start = get_week_start(date)
+    snapshot = menu_cache.load_snapshot(meal, week_start)
+    if not fresh and snapshot and not menu_cache.has_validators(snapshot) and menu_cache.is_fresh(snapshot):
+        metrics.increment("nutrislice_cache_hits")
+        return snapshot["data"]
+
+    deadline = deadline or Deadline()
+    breaker = get_circuit_breaker()
+    url = get_nutrislice_url(date, meal)
+    error = "no attempt made"
+    for attempt in range(1, get_max_attempts() + 1):
+        if attempt > 1:
+            delay = backoff_seconds(attempt - 1)
+            if delay >= deadline.remaining():
+                break
+            metrics.increment("nutrislice_retries")
+            time.sleep(delay)
+
+        if deadline.expired():
+            error = "fetch deadline exceeded"
+            break
+        if not breaker.allow():
+            metrics.increment("nutrislice_short_circuited")
+            error = "circuit breaker open"
+            break
+
+        try:
+            metrics.increment("nutrislice_requests")
+            with metrics.observe_time("nutrislice_request_seconds"):
+                response = get_http_session().get(
+                    url,
+                    timeout=min(REQUEST_TIMEOUT_SECONDS, deadline.remaining()),
+                    headers=menu_cache.get_conditional_headers(snapshot),
+                )
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            error = str(e)
+            continue
+
+        if response.status_code in RETRYABLE_STATUSES:
+            breaker.record_failure()
+            error = f"HTTP {response.status_code}"
+            continue
+
+        breaker.record_success()
+        if response.status_code == 304 and snapshot:
+            metrics.increment("nutrislice_not_modified")
+            menu_cache.save_snapshot(
+                meal,
+                week_start,
+                snapshot["data"],
+                etag=response.headers.get("ETag") or snapshot.get("etag"),
+                last_modified=response.headers.get("Last-Modified") or snapshot.get("last_modified"),
+            )
+            return snapshot["data"]
+
         try:
-            response = requests.get(url, timeout=10)
             response.raise_for_status()
+            metrics.observe("nutrislice_payload_bytes", len(response.content))
             data = response.json()
-            daily_menu[meal] = data
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching {meal} menu for {date}: {e}")
-            daily_menu[meal] = None
-            
-    return daily_menu
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error = str(e)
+            break
+
+        menu_cache.save_snapshot(
+            meal,
+            week_start,
+            data,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return data
+
+    metrics.increment("nutrislice_errors")
+    if snapshot:
+        metrics.increment("nutrislice_stale_payloads")
+        fetched_at = snapshot.get("fetched_at")
+        age = f"{(time.time() - fetched_at) / 3600:.1f}h old" if fetched_at else "of unknown age"
+        logging.warning(f"Fetching {meal} menu for {date} failed ({error}); using the stale snapshot ({age}).")
+        return StalePayload(snapshot["data"], fetched_at)
+
+    logging.error(f"Error fetching {meal} menu for {date}: {error}")
+    return None
+
+def fetch_menu_payloads(
+    requests_to_send: Iterable[Tuple[str, datetime.date]],
+    max_workers: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    fresh: bool = False,
+) -> Dict[Tuple[str, datetime.date], Optional[Dict[str, Any]]]:
+    """
+    Fetches every (meal, date) payload concurrently over the shared session, all
+    within one `deadline` (default: NUTRISLICE_FETCH_DEADLINE_SECONDS from now).
+    Failed requests map to their last good snapshot (a StalePayload) or None.
+    `fresh` revalidates every payload upstream; see _fetch_meal_payload.
+    """
+    keys = list(dict.fromkeys(requests_to_send))
+    if not keys:
+        return {}
+
+    deadline = deadline or Deadline()
+    workers = min(max_workers or get_fetch_concurrency(), len(keys))
+    if workers == 1:
+        return {key: _fetch_meal_payload(*key, deadline=deadline, fresh=fresh) for key in keys}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nutrislice") as executor:
+        payloads = executor.map(lambda key: _fetch_meal_payload(*key, deadline=deadline, fresh=fresh), keys)
+        return dict(zip(keys, payloads))
+
+def fetch_menu_data(date: datetime.date) -> Dict[str, Any]:
+    """
+    Fetches menu data for all meal types for a given date.
+    Returns a dictionary keyed by meal type.
+    """
+    payloads = fetch_menu_payloads((meal, date) for meal in MEAL_TYPES)
+    return {meal: payloads[(meal, date)] for meal in MEAL_TYPES}
+
+def fetch_menu_weeks(dates: Iterable[datetime.date], fresh: bool = False) -> Dict[datetime.date, Dict[str, Any]]:
+    """
+    Fetches each Nutrislice week covering `dates` exactly once.
+    All (meal, week) requests are sent at once; see fetch_menu_payloads.
+    Returns raw weekly payloads keyed by week start, then by meal type.
+    """
+    week_starts = sorted({get_week_start(date) for date in dates})
+    payloads = fetch_menu_payloads(
+        ((meal, week_start) for week_start in week_starts for meal in MEAL_TYPES),
+        fresh=fresh,
+    )
+    return {
+        week_start: {meal: payloads[(meal, week_start)] for meal in MEAL_TYPES}
+        for week_start in week_starts
+    }
+
+class MenuRange(dict):
+    """
+    Parsed items keyed by date, as returned by fetch_menu_range.
+    `stale` maps (meal, week start) to the snapshot time of payloads served stale;
+    `missing` lists (meal, week start) pairs that could not be fetched at all.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.stale: Dict[Tuple[str, str], Optional[float]] = {}
+        self.missing: List[Tuple[str, str]] = []
+
+def fetch_menu_range(start_date: datetime.date, end_date: datetime.date, fresh: bool = False) -> MenuRange:
+    """
+    Fetches and parses menus for every date from `start_date` to `end_date` inclusive.
+    Weeks with a fresh menu artifact (see services/menu_artifact.py) are read from it;
+    other (meal, week) payloads are requested once and sliced into per-date item lists.
+    `fresh` skips artifacts and cached snapshots and revalidates every week upstream,
+    for callers that must see changes made since the last build (send_menu --update).
+    """
+    result = MenuRange()
+    if end_date < start_date:
+        return result
+
+    dates = [start_date + datetime.timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    menu_by_date: Dict[datetime.date, List["MenuItem"]] = {date: [] for date in dates}
+    date_lookup = {date.isoformat(): date for date in dates}
+
+    missing_dates = []
+    for week_start in sorted({get_week_start(date) for date in dates}):
+        artifact = None if fresh else menu_artifact.load_artifact(week_start)
+        week_dates = [date for date in dates if get_week_start(date) == week_start]
+        if artifact is None:
+            missing_dates.extend(week_dates)
+            continue
+        for date in week_dates:
+            menu_by_date[date].extend(menu_artifact.artifact_menu_items(artifact, date.isoformat()))
+
+    for week_start, weekly_menu in (fetch_menu_weeks(missing_dates, fresh=fresh).items() if missing_dates else []):
+        for meal, payload in weekly_menu.items():
+            if payload is None:
+                result.missing.append((meal, week_start.isoformat()))
+            elif is_stale(payload):
+                result.stale[(meal, week_start.isoformat())] = payload.fetched_at
+
+        for item in parse_menu(weekly_menu):
+            item_date = date_lookup.get(item.date)
+            if item_date is not None:
+                menu_by_date[item_date].append(item)
+
+    result.update((date, sort_menu_items(items)) for date, items in menu_by_date.items())
+    return result
+
+def prewarm_menu_weeks(dates: Iterable[datetime.date]) -> int:
+    """
+    Downloads snapshots for weeks covering `dates` that are not cached yet, so the
+    next run (or a preview) starts from disk. Returns the number of weeks fetched.
+    """
+    if menu_cache.get_cache_dir() is None:
+        return 0
+
+    missing_weeks = sorted({
+        get_week_start(date)
+        for date in dates
+        if any(menu_cache.load_snapshot(meal, get_week_start(date)) is None for meal in MEAL_TYPES)
+    })
+    if missing_weeks:
+        fetch_menu_weeks(missing_weeks)
+
+    return len(missing_weeks)
 
 # Hardcoded stations as requested
 STATIONS = [
@@ -43,16 +322,101 @@ STATIONS = [
 STATION_ORDER = {station.lower(): index for index, station in enumerate(STATIONS)}
 MEAL_ORDER = {meal: index for index, meal in enumerate(MEAL_TYPES)}
 
-def parse_menu(daily_menu: Dict[str, Any], target_date: Optional[datetime.date] = None) -> List[Dict[str, str]]:
+def normalize_station_key(value: str) -> str:
     """
-    Parses the raw API response into a flat list of menu items.
-    Structure: [{'meal': 'lunch', 'station': 'Grill', 'name': 'Burger', 'description': '...'}, ...]
-    
-    Args:
-        daily_menu: Dictionary of raw API data keyed by meal type.
-        target_date: If provided, only parse items for this specific date.
+    Lowercases and drops everything but a-z and 0-9, like normalizeStationKey in web/lib/menu.ts.
+    """
+    return re.sub(r"[^a-z0-9]", "", value.lower())
+
+STATION_BY_KEY = {normalize_station_key(station): station for station in STATIONS}
+
+def normalize_station_name(value: Optional[str]) -> str:
+    """
+    Maps a Nutrislice station header to its canonical STATIONS name ("TEXMEX" -> "TexMex"),
+    or title-cases unknown stations word by word. Mirrors normalizeStationName in web/lib/menu.ts.
+    """
+    trimmed = (value or "").strip()
+    if not trimmed:
+        return "General"
+
+    matched = STATION_BY_KEY.get(normalize_station_key(trimmed))
+    if matched:
+        return matched
+
+    return " ".join(part[:1].upper() + part[1:] for part in trimmed.lower().split())
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+class MenuItem:
+    """
+    One parsed menu entry. Strings are interned so repeated dates, meals and stations
+    share storage, and everything downstream needs (lowercase station key, sort key,
+    normalized name words, escaped name) is computed once at parse time.
+    Supports item["name"] and item.get("name") for code written against the old dicts.
+    """
+
+    __slots__ = ("date", "meal", "station", "name", "station_key", "sort_key", "words", "name_html", "_hash")
+    FIELDS = ("date", "meal", "station", "name")
+
+    def __init__(self, date: Optional[str], meal: str, station: str, name: str):
+        self.date = _intern(date)
+        self.meal = _intern(meal)
+        self.station = _intern(station)
+        self.name = _intern(name)
+        self.station_key = _intern(station.lower())
+        self.sort_key = (
+            date or "",
+            MEAL_ORDER.get(meal.lower(), 99),
+            STATION_ORDER.get(self.station_key, 999),
+            self.station_key,
+            name.lower(),
+        )
+        self.words = frozenset(_normalize_text_words(" ".join(name.split()).lower()))
+        self.name_html = escape(name)
+        self._hash = hash((self.date, self.meal, self.station, self.name))
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MenuItem):
+            return NotImplemented
+        return (
+            self._hash == other._hash
+            and self.date == other.date
+            and self.meal == other.meal
+            and self.station == other.station
+            and self.name == other.name
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"MenuItem({self.date!r}, {self.meal!r}, {self.station!r}, {self.name!r})"
+
+def iter_menu_foods(
+    daily_menu: Dict[str, Any],
+    target_date: Optional[datetime.date] = None,
+) -> Iterator[Tuple[Optional[str], str, str, str, Dict[str, Any]]]:
+    """
+    Walks raw API payloads keyed by meal type, yielding (date, meal, station, name, food)
+    for every food entry under its normalized station header. Names are trimmed and
+    foods without one are skipped, like the web's live parser.
+    Shared by parse_menu and the menu artifact build so both see the same items.
     """
-    parsed_items = []
     target_date_str = target_date.strftime("%Y-%m-%d") if target_date else None
     
     for meal_type, data in daily_menu.items():
@@ -74,24 +438,34 @@ def parse_menu(daily_menu: Dict[str, Any], target_date: Optional[datetime.date]
             for item in menu_items:
                 # Update current station if this item is a header
                 if item.get('is_station_header'):
-                    current_station = item.get('text', 'General').title()
+                    current_station = normalize_station_name(item.get('text'))
                     continue
                 
                 # Skip non-food items
                 food = item.get('food')
                 if not food:
                     continue
-                
-                food_name = food.get('name', 'Unknown')
-                
-                parsed_items.append({
-                    'date': day.get('date'),
-                    'meal': meal_type,
-                    'station': current_station,
-                    'name': food_name,
-                })
-                
-    return parsed_items
+
+                name = food.get('name')
+                name = name.strip() if isinstance(name, str) else ""
+                if not name:
+                    continue
+
+                yield day.get('date'), meal_type, current_station, name, food
+
+def parse_menu(daily_menu: Dict[str, Any], target_date: Optional[datetime.date] = None) -> List[MenuItem]:
+    """
+    Parses the raw API response into a flat list of menu items.
+    Structure: [MenuItem(date='2026-04-13', meal='lunch', station='Grill', name='Burger'), ...]
+    
+    Args:
+        daily_menu: Dictionary of raw API data keyed by meal type.
+        target_date: If provided, only parse items for this specific date.
+    """
+    return [
+        MenuItem(date, meal, station, name)
+        for date, meal, station, name, _ in iter_menu_foods(daily_menu, target_date)
+    ]
 
 def get_available_stations(date: datetime.date = None) -> List[str]:
     """
@@ -99,23 +473,24 @@ def get_available_stations(date: datetime.date = None) -> List[str]:
     """
     return sorted(STATIONS)
 
-def filter_menu_for_user(menu_items: List[Dict], preferences: Dict) -> List[Dict]:
+def filter_menu_for_user(menu_items: List[MenuItem], preferences: Dict) -> List[MenuItem]:
     """
     Filters the menu items based on user preferences.
     """
-    user_meals = [m.lower() for m in preferences.get('meals', [])]
-    user_stations = [s.lower() for s in preferences.get('stations', [])]
+    user_meals = {m.lower() for m in preferences.get('meals', [])}
+    user_stations = {s.lower() for s in preferences.get('stations', [])}
     
     filtered = []
     for item in menu_items:
         # 1. Check Meal Type
-        if item['meal'].lower() not in user_meals:
+        # Meal types come from MEAL_TYPES and are already lowercase.
+        if item.meal not in user_meals:
             continue
             
         # 2. Check Station
         # Station matching can be tricky (substrings vs exact). 
         # Our app uses exact strings from the API, so exact match should work.
-        if item['station'].lower() not in user_stations:
+        if item.station_key not in user_stations:
             continue
             
         filtered.append(item)
@@ -182,67 +557,209 @@ def _term_matches_item_words(term: str, item_words: set[str]) -> bool:
 
     return True
 
-def find_watchlist_hits(menu_items: List[Dict], preferences: Dict[str, Any]) -> List[Dict]:
+class WatchlistIndex:
+    """
+    Inverted index from every normalized word variant to the positions of the
+    menu items whose names contain it. Build it once per menu window and pass it
+    to find_watchlist_hits so each user's watchlist resolves through set lookups.
+    """
+
+    def __init__(self, menu_items: List[MenuItem]):
+        self.items = list(menu_items)
+        self.words: Dict[str, set[int]] = {}
+        self._term_positions: Dict[str, frozenset[int]] = {}
+
+        for position, item in enumerate(self.items):
+            for word in item.words:
+                self.words.setdefault(word, set()).add(position)
+
+    def match_term(self, term: str) -> frozenset[int]:
+        """
+        Positions of items matching every word of `term`, using the same
+        plural/singular rules as _term_matches_item_words.
+        """
+        cached = self._term_positions.get(term)
+        if cached is not None:
+            return cached
+
+        positions: Optional[set[int]] = None
+        for term_word in term.split():
+            word_positions: set[int] = set()
+            for variant in _normalize_word_forms(term_word):
+                word_positions.update(self.words.get(variant, ()))
+
+            positions = word_positions if positions is None else positions & word_positions
+            if not positions:
+                break
+
+        matched = frozenset(positions or ())
+        self._term_positions[term] = matched
+        return matched
+
+def find_watchlist_hits(
+    menu_items: List[MenuItem],
+    preferences: Dict[str, Any],
+    index: Optional[WatchlistIndex] = None,
+) -> List[MenuItem]:
     """
     Finds watchlist matches across all stations while respecting selected meals.
     Returns de-duplicated, sorted menu items that match at least one saved term.
+    Pass a WatchlistIndex built from `menu_items` to reuse it across users.
     """
     watchlist_terms = get_watchlist_terms(preferences)
     if not watchlist_terms:
         return []
 
+    if index is None:
+        index = WatchlistIndex(menu_items)
+
     user_meals = {
         meal.lower()
         for meal in preferences.get("meals", [])
         if isinstance(meal, str) and meal.strip()
     }
 
+    matched_positions: set[int] = set()
+    for term in watchlist_terms:
+        matched_positions.update(index.match_term(term))
+
     hits = []
     seen = set()
 
-    for item in menu_items:
-        item_meal = item.get("meal", "").lower()
-        if user_meals and item_meal not in user_meals:
-            continue
-
-        normalized_name = " ".join(str(item.get("name", "")).split()).lower()
-        item_words = _normalize_text_words(normalized_name)
-        if not item_words:
+    for position in sorted(matched_positions):
+        item = index.items[position]
+        if user_meals and item.meal not in user_meals:
             continue
 
-        if not any(_term_matches_item_words(term, item_words) for term in watchlist_terms):
+        if item in seen:
             continue
 
-        item_key = (
-            item.get("date", ""),
-            item.get("meal", ""),
-            item.get("station", ""),
-            item.get("name", ""),
-        )
-        if item_key in seen:
-            continue
-
-        seen.add(item_key)
+        seen.add(item)
         hits.append(item)
 
     return sort_menu_items(hits)
 
-def sort_menu_items(menu_items: List[Dict]) -> List[Dict]:
+def sort_menu_items(menu_items: List[MenuItem]) -> List[MenuItem]:
     """
     Sort menu items by date, meal order, station order, then item name.
     """
-    return sorted(
-        menu_items,
-        key=lambda item: (
-            item.get('date', ''),
-            MEAL_ORDER.get(item.get('meal', '').lower(), 99),
-            STATION_ORDER.get(item.get('station', '').lower(), 999),
-            item.get('station', '').lower(),
-            item.get('name', '').lower(),
-        ),
-    )
+    return sorted(menu_items, key=lambda item: item.sort_key)
+
+# (station, items) pairs for one meal, in display order
+StationBuckets = List[Tuple[str, Tuple[MenuItem, ...]]]
+# (date, [(meal, StationBuckets), ...]) pairs in display order
+DigestSections = List[Tuple[str, List[Tuple[str, StationBuckets]]]]
+
+class MenuDigest:
+    """
+    A user's digest as ordered date -> meal -> station buckets, ready to render.
+    Iterating yields the items in the same order sort_menu_items would.
+    """
+
+    __slots__ = ("sections", "item_count")
+
+    def __init__(self, sections: DigestSections):
+        self.sections = sections
+        self.item_count = sum(
+            len(items)
+            for _, meals in sections
+            for _, stations in meals
+            for _, items in stations
+        )
+
+    def __len__(self) -> int:
+        return self.item_count
+
+    def __bool__(self) -> bool:
+        return self.item_count > 0
+
+    def __iter__(self):
+        for _, meals in self.sections:
+            for _, stations in meals:
+                for _, items in stations:
+                    yield from items
+
+class MenuIndex:
+    """
+    Menu items sorted once and bucketed by date -> meal -> station.
+    select() builds a user's digest by picking buckets in order, without
+    scanning items or re-sorting them.
+    """
+
+    def __init__(self, menu_items: Iterable[MenuItem]):
+        self.buckets: Dict[str, Dict[str, Dict[str, List[MenuItem]]]] = {}
+
+        for item in sort_menu_items(menu_items):
+            date_key = item.date or "unknown-date"
+            meals = self.buckets.setdefault(date_key, {})
+            stations = meals.setdefault(item.meal, {})
+            stations.setdefault(item.station, []).append(item)
+
+        self._sections: Dict[str, List[Tuple[str, List[Tuple[str, str, Tuple[MenuItem, ...]]]]]] = {
+            date_key: [
+                (meal, [(station, station.lower(), tuple(items)) for station, items in stations.items()])
+                for meal, stations in meals.items()
+            ]
+            for date_key, meals in self.buckets.items()
+        }
+        self._windows: Dict[Tuple[str, ...], List[MenuItem]] = {}
+
+    def select(
+        self,
+        dates: Optional[Iterable[str]] = None,
+        meals: Optional[Iterable[str]] = None,
+        stations: Optional[Iterable[str]] = None,
+    ) -> MenuDigest:
+        """
+        Returns the buckets for `dates` (ISO strings) whose meal and lowercase station
+        are selected. None means no filter; matching follows filter_menu_for_user.
+        """
+        date_keys = list(self._sections) if dates is None else dates
+        meal_filter = None if meals is None else set(meals)
+        station_filter = None if stations is None else set(stations)
+
+        sections: DigestSections = []
+        for date_key in date_keys:
+            selected_meals = []
+            for meal, station_buckets in self._sections.get(date_key, ()):
+                if meal_filter is not None and meal not in meal_filter:
+                    continue
+
+                selected_stations = [
+                    (station, items)
+                    for station, station_key, items in station_buckets
+                    if station_filter is None or station_key in station_filter
+                ]
+                if selected_stations:
+                    selected_meals.append((meal, selected_stations))
+
+            if selected_meals:
+                sections.append((date_key, selected_meals))
+
+        return MenuDigest(sections)
+
+    def select_for_user(self, dates: Iterable[str], preferences: Dict[str, Any]) -> MenuDigest:
+        return self.select(
+            dates,
+            meals={meal.lower() for meal in preferences.get("meals", [])},
+            stations={station.lower() for station in preferences.get("stations", [])},
+        )
+
+    def window_items(self, dates: Iterable[str]) -> List[MenuItem]:
+        """
+        All items for `dates` in sorted order, memoized per window.
+        """
+        window = tuple(dates)
+        items = self._windows.get(window)
+        if items is None:
+            items = list(self.select(window))
+            self._windows[window] = items
+        return items
 
 if __name__ == "__main__":
+    from services.config import bootstrap
+
+    bootstrap()
     # Quick test
     today = datetime.date.today()
     # For testing, you might want to force a date that likely has data if today is weekend/break
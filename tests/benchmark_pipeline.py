@@ -0,0 +1,359 @@
+"""
+Usage:
+    python tests/benchmark_pipeline.py
+
+Options:
+    python tests/benchmark_pipeline.py --users 1000 --users 10000 --users 100000
+    python tests/benchmark_pipeline.py --output bench_results.json --threshold 0.25
+    python tests/benchmark_pipeline.py --update-baseline
+    python tests/benchmark_pipeline.py --record 2026-04-13
+
+Times the menu pipeline hot paths (parse_menu, sort_menu_items, filter_menu_for_user
+and its vectorized BatchMenuFilter counterpart, find_watchlist_hits, generate_html_email, MIME encoding and per-recipient
+MessageTemplate rendering) on the Nutrislice week fixtures in
+tests/fixtures/nutrislice with seeded synthetic user populations.
+Results are written as JSON; the run exits with status 1 when any benchmark is slower
+than the stored baseline by more than --threshold. Baselines are machine specific, so
+refresh them with --update-baseline on the machine that runs the comparison.
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from services.batch_filter import BatchMenuFilter
+from services.email_sender import MessageTemplate, build_message
+from services.email_templates import TOKEN_PLACEHOLDER, FragmentCache, fill_token, generate_html_email
+from services.utils import (
+    MEAL_TYPES,
+    STATIONS,
+    MenuIndex,
+    WatchlistIndex,
+    fetch_menu_weeks,
+    filter_menu_for_user,
+    find_watchlist_hits,
+    get_week_start,
+    parse_menu,
+    sort_menu_items,
+)
+
+FIXTURES_DIR = ROOT_DIR / "tests" / "fixtures" / "nutrislice"
+BASELINE_PATH = ROOT_DIR / "tests" / "fixtures" / "benchmark_baseline.json"
+DEFAULT_USERS = [1000, 10000, 100000]
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 3
+# Rendering and MIME encoding are timed on a sample; their cost does not depend on population size.
+DEFAULT_SAMPLE = 2000
+SEED = 20260413
+
+# (meals, weight): most users keep the default of all meals.
+MEAL_SPREAD = [
+    (["breakfast", "lunch", "dinner"], 45),
+    (["lunch", "dinner"], 25),
+    (["lunch"], 12),
+    (["dinner"], 8),
+    (["breakfast", "lunch"], 10),
+]
+POPULAR_STATIONS = ["Main Line", "Grill", "Pizza", "Desserts", "Soup", "Deli", "Salad Bar", "TexMex"]
+# Watchlist terms that never appear on the fixture menus.
+MISSING_TERMS = ["lobster", "sushi roll", "pad thai", "birria tacos", "matcha latte"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the menu pipeline hot paths against a stored baseline.",
+    )
+    parser.add_argument(
+        "--users",
+        action="append",
+        type=int,
+        dest="populations",
+        help="Synthetic population size. Repeat for multiple sizes (default: 1000, 10000, 100000).",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per benchmark; the fastest is kept")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE, help="Users sampled for rendering and MIME encoding")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="Directory of Nutrislice week fixtures")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this path (default: stdout only)")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown over the baseline as a fraction (default: 0.25)",
+    )
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--record", help="Fetch the live week containing YYYY-MM-DD into the fixtures directory and exit")
+    return parser.parse_args()
+
+
+def record_fixtures(date_arg: str, fixtures_dir: Path) -> None:
+    target_date = datetime.datetime.strptime(date_arg, "%Y-%m-%d").date()
+    week_start = get_week_start(target_date)
+    payloads = fetch_menu_weeks([target_date]).get(week_start, {})
+
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for meal, data in payloads.items():
+        if not data:
+            print(f"No {meal} data for the week of {week_start}; skipped.")
+            continue
+        path = fixtures_dir / f"week-{week_start.isoformat()}-{meal}.json.gz"
+        with gzip.open(path, "wt", encoding="utf-8") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+        print(f"Recorded {path}")
+
+
+def load_fixture_weeks(fixtures_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns {week_start: {meal: payload}} for every week-<date>-<meal>.json.gz fixture.
+    """
+    weeks: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(fixtures_dir.glob("week-*.json.gz")):
+        week_start, meal = path.name[len("week-"):-len(".json.gz")].rsplit("-", 1)
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            weeks.setdefault(week_start, {})[meal] = json.load(handle)
+    return weeks
+
+
+def build_users(count: int, menu_names: List[str], seed: int = SEED) -> List[Dict[str, Any]]:
+    """
+    Seeded synthetic users shaped like rows from the users table.
+    """
+    rng = random.Random(seed + count)
+    meal_choices = [meals for meals, _ in MEAL_SPREAD]
+    meal_weights = [weight for _, weight in MEAL_SPREAD]
+    other_stations = [station for station in STATIONS if station not in POPULAR_STATIONS]
+    menu_terms = sorted({name.lower() for name in menu_names})
+
+    users = []
+    for index in range(count):
+        stations = rng.sample(POPULAR_STATIONS, rng.randint(2, len(POPULAR_STATIONS)))
+        stations += rng.sample(other_stations, rng.randint(0, 4))
+
+        watchlist = []
+        if rng.random() < 0.45:
+            for _ in range(rng.randint(1, 4)):
+                roll = rng.random()
+                if roll < 0.6:
+                    watchlist.append(rng.choice(menu_terms))
+                elif roll < 0.85:
+                    watchlist.append(rng.choice(rng.choice(menu_terms).split()))
+                else:
+                    watchlist.append(rng.choice(MISSING_TERMS))
+
+        users.append({
+            "email": f"user{index:06d}@example.edu",
+            "token": f"token-{index:06d}",
+            "preferences": {
+                "meals": rng.choices(meal_choices, meal_weights)[0],
+                "stations": stations,
+                "days_ahead": 2 if rng.random() < 0.25 else 1,
+                "watchlist": watchlist,
+            },
+        })
+    return users
+
+
+def measure(name: str, operations: int, repeat: int, func: Callable[[], Any]) -> Dict[str, Any]:
+    """
+    Runs `func` `repeat` times and keeps the fastest run.
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = {
+        "operations": operations,
+        "seconds": round(best, 6),
+        "us_per_op": round(best / max(1, operations) * 1_000_000, 3),
+    }
+    print(f"{name:<40}{operations:>9} ops{result['seconds']:>11.4f} s{result['us_per_op']:>12.2f} us/op")
+    return result
+
+
+def get_window(start_date: datetime.date, days_ahead: int) -> Tuple[str, ...]:
+    return tuple((start_date + datetime.timedelta(days=offset)).isoformat() for offset in range(days_ahead))
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    weeks = load_fixture_weeks(args.fixtures)
+    if not weeks:
+        raise SystemExit(f"No fixtures found in {args.fixtures}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    repeat = args.repeat
+
+    payloads = list(weeks.values())
+    parsed = [parse_menu(payload) for payload in payloads]
+    menu_items = [item for items in parsed for item in items]
+    results["parse_menu[week]"] = measure(
+        "parse_menu[week]", len(payloads), repeat,
+        lambda: [parse_menu(payload) for payload in payloads],
+    )
+    results["sort_menu_items[week]"] = measure(
+        "sort_menu_items[week]", len(parsed), repeat,
+        lambda: [sort_menu_items(items) for items in parsed],
+    )
+
+    start_date = datetime.date.fromisoformat(min(item.date for item in menu_items))
+    menu_index = MenuIndex(menu_items)
+    windows = {days: menu_index.window_items(get_window(start_date, days)) for days in (1, 2)}
+    watchlist_indexes = {days: WatchlistIndex(items) for days, items in windows.items()}
+    menu_names = [item.name for item in menu_items if item.meal in MEAL_TYPES]
+
+    for population in args.populations or DEFAULT_USERS:
+        users = build_users(population, menu_names)
+        preferences = [(user["preferences"], user["preferences"]["days_ahead"]) for user in users]
+        watchers = [(prefs, days) for prefs, days in preferences if prefs["watchlist"]]
+
+        results[f"filter_menu_for_user[{population}]"] = measure(
+            f"filter_menu_for_user[{population}]", len(preferences), repeat,
+            lambda: [filter_menu_for_user(windows[days], prefs) for prefs, days in preferences],
+        )
+        by_window = {days: [prefs for prefs, user_days in preferences if user_days == days] for days in windows}
+        results[f"batch_filter[{population}]"] = measure(
+            f"batch_filter[{population}]", len(preferences), repeat,
+            lambda: [BatchMenuFilter(windows[days]).select_rows(prefs) for days, prefs in by_window.items()],
+        )
+        results[f"find_watchlist_hits[{population}]"] = measure(
+            f"find_watchlist_hits[{population}]", len(watchers), repeat,
+            lambda: [
+                find_watchlist_hits(windows[days], prefs, index=watchlist_indexes[days])
+                for prefs, days in watchers
+            ],
+        )
+
+        sample = users[:args.sample]
+        digests = [
+            (
+                menu_index.select_for_user(get_window(start_date, user["preferences"]["days_ahead"]), user["preferences"]),
+                find_watchlist_hits(
+                    windows[user["preferences"]["days_ahead"]],
+                    user["preferences"],
+                    index=watchlist_indexes[user["preferences"]["days_ahead"]],
+                ),
+                user["preferences"]["days_ahead"],
+            )
+            for user in sample
+        ]
+
+        def render_all() -> List[str]:
+            fragment_cache = FragmentCache()
+            return [
+                generate_html_email(
+                    digest, TOKEN_PLACEHOLDER, start_date, days_ahead,
+                    watchlist_hits=hits, fragment_cache=fragment_cache,
+                )
+                for digest, hits, days_ahead in digests
+            ]
+
+        results[f"generate_html_email[{population}]"] = measure(
+            f"generate_html_email[{population}]", len(digests), repeat, render_all,
+        )
+
+        rendered = render_all()
+        bodies = [
+            (user["email"], fill_token(html_body, user["token"]))
+            for user, html_body in zip(sample, rendered)
+        ]
+        results[f"mime_encode[{population}]"] = measure(
+            f"mime_encode[{population}]", len(bodies), repeat,
+            lambda: [
+                build_message("menus@example.edu", email, "Dickinson Daily Menu", html_body)
+                for email, html_body in bodies
+            ],
+        )
+
+        templates: Dict[str, MessageTemplate] = {}
+        for html_body in rendered:
+            if html_body not in templates:
+                templates[html_body] = MessageTemplate("menus@example.edu", "Dickinson Daily Menu", html_body, TOKEN_PLACEHOLDER)
+        recipients = [(user["email"], user["token"], templates[html_body]) for user, html_body in zip(sample, rendered)]
+        results[f"mime_template_render[{population}]"] = measure(
+            f"mime_template_render[{population}]", len(recipients), repeat,
+            lambda: [template.render(email, token) for email, token, template in recipients],
+        )
+
+    return results
+
+
+def compare_with_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+) -> List[str]:
+    """
+    Returns a line per benchmark whose us/op exceeds the baseline by more than `threshold`.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected or not expected.get("us_per_op"):
+            continue
+
+        ratio = result["us_per_op"] / expected["us_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {result['us_per_op']:.2f} us/op vs baseline {expected['us_per_op']:.2f} "
+                f"({(ratio - 1) * 100:+.0f}%)"
+            )
+    return regressions
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.record:
+        record_fixtures(args.record, args.fixtures)
+        return
+
+    results = run_benchmarks(args)
+    report = {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sample": args.sample,
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote results to {args.output}")
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Stored baseline in {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%} threshold:")
+        for line in regressions:
+            print(f"  {line}")
+        raise SystemExit(1)
+
+    print(f"No regressions over {args.threshold:.0%} threshold.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Usage:
+    python tests/benchmark_startup.py
+
+Options:
+    python tests/benchmark_startup.py --repeat 10
+    python tests/benchmark_startup.py --budget-ms 150
+    python tests/benchmark_startup.py --importtime send_menu
+
+Measures cold-start cost of the entry-point modules: each one is imported in a fresh
+interpreter, --repeat times, and the best wall time (interpreter start + import) and
+import-only time are reported. The run exits with status 1 when an entry point pulls
+in a module that should only be loaded on first use (HEAVY_MODULES), or when an
+import takes longer than --budget-ms. --importtime prints the slowest modules from
+`python -X importtime` for one entry point.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+ENTRY_POINTS = [
+    "send_menu",
+    "services.utils",
+    "services.email_sender",
+    "services.email_templates",
+    "services.menu_artifact",
+    "services.menu_archive",
+]
+# Imported lazily by the code that needs them; none should load at import time.
+HEAVY_MODULES = ["supabase", "requests", "pandas", "numpy", "dotenv"]
+DEFAULT_REPEAT = 5
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "import_seconds": time.perf_counter() - started,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark cold-start import time of the entry points.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Fresh interpreters per entry point")
+    parser.add_argument("--budget-ms", type=float, help="Fail when an import takes longer than this")
+    parser.add_argument("--importtime", metavar="MODULE", help="Print the slowest imports of MODULE and exit")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    return parser.parse_args()
+
+
+def measure_module(module: str, repeat: int) -> Dict[str, Any]:
+    best_wall = best_import = float("inf")
+    heavy: List[str] = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        best_wall = min(best_wall, time.perf_counter() - started)
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        best_import = min(best_import, probe["import_seconds"])
+        heavy = probe["heavy"]
+
+    return {
+        "wall_ms": round(best_wall * 1000, 1),
+        "import_ms": round(best_import * 1000, 1),
+        "heavy_modules": heavy,
+    }
+
+
+def print_importtime(module: str, limit: int = 15) -> None:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+
+    print(f"{'cumulative ms':>14}  module")
+    for cumulative_us, name in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:>14.1f}  {name}")
+
+
+def main() -> None:
+    args = parse_args()
+
+    if args.importtime:
+        print_importtime(args.importtime)
+        return
+
+    results = {module: measure_module(module, args.repeat) for module in ENTRY_POINTS}
+    baseline = measure_module("sys", args.repeat)
+
+    print(f"{'module':<28}{'wall ms':>10}{'import ms':>11}  heavy modules")
+    print(f"{'(bare interpreter)':<28}{baseline['wall_ms']:>10.1f}{'':>11}")
+    for module, result in results.items():
+        heavy = ", ".join(result["heavy_modules"]) or "-"
+        print(f"{module:<28}{result['wall_ms']:>10.1f}{result['import_ms']:>11.1f}  {heavy}")
+
+    if args.output:
+        args.output.write_text(
+            json.dumps({"interpreter": baseline, "results": results}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"Wrote results to {args.output}")
+
+    failures = [
+        f"{module} imports {', '.join(result['heavy_modules'])} at startup"
+        for module, result in results.items()
+        if result["heavy_modules"]
+    ]
+    if args.budget_ms is not None:
+        failures += [
+            f"{module} takes {result['import_ms']:.1f} ms to import (budget {args.budget_ms:.0f} ms)"
+            for module, result in results.items()
+            if result["import_ms"] > args.budget_ms
+        ]
+
+    if failures:
+        print("Startup regressions:")
+        for line in failures:
+            print(f"  {line}")
+        raise SystemExit(1)
+
+    print("No startup regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Usage:
+    python tests/check_message_template.py
+
+Options:
+    python tests/check_message_template.py --users 500
+
+Checks that MessageTemplate.render produces the message build_message() would:
+digests for synthetic users are rendered from the Nutrislice week fixtures in
+tests/fixtures/nutrislice in both compact and full mode, and every rendered message
+is parsed back and compared with build_message() for the same recipient: the same
+headers in the same order (apart from the MIME boundary), the same HTML part, and
+CRLF line endings throughout. Non-ASCII bodies, addresses and tokens are included.
+Exits with status 1 on the first mismatch.
+"""
+
+import argparse
+import datetime
+import email
+import re
+import sys
+from email.policy import default
+from email.utils import parseaddr
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmark_pipeline import FIXTURES_DIR, build_users, get_window, load_fixture_weeks
+from services.email_sender import MessageTemplate, build_message
+from services.email_templates import TOKEN_PLACEHOLDER, FragmentCache, fill_token, generate_html_email
+from services.utils import MEAL_TYPES, MenuIndex, WatchlistIndex, find_watchlist_hits, parse_menu
+
+DEFAULT_USERS = 200
+FROM_EMAIL = "menus@example.edu"
+SUBJECT = "Dickinson Daily Menu"
+BOUNDARY = re.compile(r'boundary="[^"]*"')
+# Recipients and tokens that must take MessageTemplate's fallback to the full builder.
+NON_ASCII_RECIPIENTS = [("jürgen@example.edu", "token-plain"), ("user@example.edu", "tökén-ünïcode")]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check MessageTemplate output against build_message().",
+    )
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="Synthetic users to render messages for")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="Directory of Nutrislice week fixtures")
+    return parser.parse_args()
+
+
+def render_bodies(count: int, fixtures_dir: Path) -> Tuple[List[dict], List[str]]:
+    """
+    `count` synthetic users and their HTML bodies with TOKEN_PLACEHOLDER, rendered
+    in compact mode and then in full mode.
+    """
+    weeks = load_fixture_weeks(fixtures_dir)
+    if not weeks:
+        raise SystemExit(f"No fixtures found in {fixtures_dir}")
+
+    menu_items = [item for payload in weeks.values() for item in parse_menu(payload)]
+    start_date = datetime.date.fromisoformat(min(item.date for item in menu_items))
+    menu_index = MenuIndex(menu_items)
+    windows = {days: menu_index.window_items(get_window(start_date, days)) for days in (1, 2)}
+    watchlist_indexes = {days: WatchlistIndex(items) for days, items in windows.items()}
+    users = build_users(count, [item.name for item in menu_items if item.meal in MEAL_TYPES])
+
+    bodies = []
+    for compact in (True, False):
+        fragment_cache = FragmentCache(compact)
+        for user in users:
+            preferences = user["preferences"]
+            days = preferences["days_ahead"]
+            digest = menu_index.select_for_user(get_window(start_date, days), preferences)
+            hits = find_watchlist_hits(windows[days], preferences, index=watchlist_indexes[days])
+            bodies.append(generate_html_email(digest, TOKEN_PLACEHOLDER, start_date, days, watchlist_hits=hits, fragment_cache=fragment_cache))
+    return users, bodies
+
+
+def parse_message(message: bytes) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]], str]:
+    """
+    (top-level headers with the boundary blanked, HTML part headers, decoded HTML
+    with LF line endings, since build_message() serializes with LF and SMTP with CRLF).
+    """
+    parsed = email.message_from_bytes(message, policy=default)
+    headers = [(name, BOUNDARY.sub('boundary=""', str(value))) for name, value in parsed.items()]
+    parts = list(parsed.iter_parts())
+    if len(parts) != 1:
+        raise AssertionError(f"expected one MIME part, found {len(parts)}")
+    html_part = parts[0]
+    part_headers = [(name, str(value)) for name, value in html_part.items()]
+    return headers, part_headers, html_part.get_content().replace("\r\n", "\n")
+
+
+def check_message(template: MessageTemplate, html_body: str, to_email: str, token: str) -> None:
+    rendered = template.render(to_email, token)
+    if re.search(rb"(?<!\r)\n", rendered):
+        raise AssertionError("bare LF line ending in the rendered message")
+
+    expected_body = fill_token(html_body, token)
+    expected = build_message(FROM_EMAIL, to_email, SUBJECT, expected_body).encode("utf-8")
+    headers, part_headers, body = parse_message(rendered)
+    expected_headers, expected_part_headers, expected_html = parse_message(expected)
+
+    if headers != expected_headers:
+        raise AssertionError(f"headers differ:\n  template: {headers}\n  expected: {expected_headers}")
+    fields = dict(headers)
+    # A non-ASCII address is sent as an encoded word, which parses back quoted.
+    if parseaddr(fields.get("To", ""))[1] != to_email or fields.get("From") != FROM_EMAIL or fields.get("Subject") != SUBJECT:
+        raise AssertionError(f"To/From/Subject do not round-trip: {headers}")
+
+    # The template sends non-ASCII as character references (rendered identically) in a 7-bit part.
+    if html_body.isascii() and to_email.isascii() and token.isascii():
+        if part_headers != expected_part_headers:
+            raise AssertionError(f"HTML part headers differ:\n  template: {part_headers}\n  expected: {expected_part_headers}")
+    if body != expected_html.encode("ascii", "xmlcharrefreplace").decode("ascii") and body != expected_html:
+        raise AssertionError("HTML body differs")
+    if token not in body or TOKEN_PLACEHOLDER in body:
+        raise AssertionError("token was not spliced into the body")
+
+
+def main() -> None:
+    args = parse_args()
+    users, bodies = render_bodies(args.users, args.fixtures)
+    bodies.append(bodies[0].replace("</body>", "<p>Crème brûlée · café ☕</p></body>", 1))
+
+    checked = 0
+    for number, html_body in enumerate(bodies):
+        template = MessageTemplate(FROM_EMAIL, SUBJECT, html_body, TOKEN_PLACEHOLDER)
+        recipients = [(users[number % len(users)]["email"], users[number % len(users)]["token"])]
+        if number in (0, len(bodies) - 1):
+            recipients += NON_ASCII_RECIPIENTS
+
+        for to_email, token in recipients:
+            try:
+                check_message(template, html_body, to_email, token)
+            except AssertionError as e:
+                print(f"Mismatch for body {number} to {to_email}: {e}")
+                raise SystemExit(1)
+            checked += 1
+
+    print(f"{checked} MessageTemplate messages match build_message() ({len(bodies)} bodies).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Usage:
+    python tests/check_watchlist_index.py
+
+Options:
+    python tests/check_watchlist_index.py --users 1000 --seed 7
+
+Checks that find_watchlist_hits with a WatchlistIndex returns exactly what the
+original per-item scan (kept below as reference_watchlist_hits) returned, for
+seeded random preference sets on the Nutrislice week fixtures in
+tests/fixtures/nutrislice, and that the full-mode digest HTML rendered from
+either hit list is identical. Exits with status 1 on the first mismatch.
+"""
+
+import argparse
+import datetime
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmark_pipeline import FIXTURES_DIR, build_users, get_window, load_fixture_weeks
+from services.email_templates import TOKEN_PLACEHOLDER, FragmentCache, generate_html_email
+from services.utils import (
+    MEAL_TYPES,
+    MenuIndex,
+    MenuItem,
+    WatchlistIndex,
+    _normalize_text_words,
+    _term_matches_item_words,
+    find_watchlist_hits,
+    get_watchlist_terms,
+    parse_menu,
+    sort_menu_items,
+)
+
+DEFAULT_USERS = 300
+DEFAULT_SEED = 20260413
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check indexed watchlist matching against the per-item scan.",
+    )
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="Random preference sets to check")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the preference sets")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="Directory of Nutrislice week fixtures")
+    return parser.parse_args()
+
+
+def reference_watchlist_hits(menu_items: List[MenuItem], preferences: Dict[str, Any]) -> List[MenuItem]:
+    """
+    find_watchlist_hits as it was before WatchlistIndex: every term checked against
+    every item's freshly normalized name words.
+    """
+    watchlist_terms = get_watchlist_terms(preferences)
+    if not watchlist_terms:
+        return []
+
+    user_meals = {
+        meal.lower()
+        for meal in preferences.get("meals", [])
+        if isinstance(meal, str) and meal.strip()
+    }
+
+    hits = []
+    seen = set()
+
+    for item in menu_items:
+        item_meal = item.get("meal", "").lower()
+        if user_meals and item_meal not in user_meals:
+            continue
+
+        normalized_name = " ".join(str(item.get("name", "")).split()).lower()
+        item_words = _normalize_text_words(normalized_name)
+        if not item_words:
+            continue
+
+        if not any(_term_matches_item_words(term, item_words) for term in watchlist_terms):
+            continue
+
+        item_key = (
+            item.get("date", ""),
+            item.get("meal", ""),
+            item.get("station", ""),
+            item.get("name", ""),
+        )
+        if item_key in seen:
+            continue
+
+        seen.add(item_key)
+        hits.append(item)
+
+    return sort_menu_items(hits)
+
+
+def vary_term(term: str, rng: random.Random) -> str:
+    """
+    Rewrites a watchlist term the way users type them: other casing, stray
+    whitespace, or a plural/singular the matcher has to fold back.
+    """
+    roll = rng.random()
+    if roll < 0.2:
+        return term.upper()
+    if roll < 0.35:
+        return "  " + "   ".join(term.split()) + " "
+    if roll < 0.5:
+        return term + "s"
+    if roll < 0.6:
+        return term + "es"
+    if roll < 0.7 and term.endswith("y"):
+        return term[:-1] + "ies"
+    if roll < 0.8 and term.endswith("s"):
+        return term[:-1]
+    return term
+
+
+def build_preferences(count: int, menu_names: List[str], seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    preference_sets = []
+    for user in build_users(count, menu_names, seed=seed):
+        preferences = user["preferences"]
+        watchlist = [vary_term(term, rng) for term in preferences["watchlist"]]
+        if not watchlist or rng.random() < 0.3:
+            watchlist += [vary_term(rng.choice(menu_names).lower(), rng) for _ in range(rng.randint(1, 6))]
+        meals = [meal.capitalize() if rng.random() < 0.2 else meal for meal in preferences["meals"]]
+        preference_sets.append({**preferences, "meals": meals, "watchlist": watchlist})
+    return preference_sets
+
+
+def main() -> None:
+    args = parse_args()
+    weeks = load_fixture_weeks(args.fixtures)
+    if not weeks:
+        raise SystemExit(f"No fixtures found in {args.fixtures}")
+
+    menu_items = [item for payload in weeks.values() for item in parse_menu(payload)]
+    start_date = datetime.date.fromisoformat(min(item.date for item in menu_items))
+    menu_index = MenuIndex(menu_items)
+    windows = {days: menu_index.window_items(get_window(start_date, days)) for days in (1, 2)}
+    windows[7] = sort_menu_items(menu_items)
+    watchlist_indexes = {days: WatchlistIndex(items) for days, items in windows.items()}
+    menu_names = [item.name for item in menu_items if item.meal in MEAL_TYPES]
+
+    preference_sets = build_preferences(args.users, menu_names, args.seed)
+    fragment_cache = FragmentCache(compact=False)
+    checked = matched = 0
+
+    for number, preferences in enumerate(preference_sets):
+        for days, items in windows.items():
+            expected = reference_watchlist_hits(items, preferences)
+            hits = find_watchlist_hits(items, preferences, index=watchlist_indexes[days])
+            if [item.to_dict() for item in hits] != [item.to_dict() for item in expected]:
+                print(f"Mismatch for preference set {number} over {days} day(s): {preferences}")
+                print(f"  index:     {[item.name for item in hits]}")
+                print(f"  reference: {[item.name for item in expected]}")
+                raise SystemExit(1)
+            checked += 1
+            matched += bool(hits)
+
+            if days == 7:
+                continue
+
+            digest = menu_index.select_for_user(get_window(start_date, days), preferences)
+            html_body = generate_html_email(digest, TOKEN_PLACEHOLDER, start_date, days, watchlist_hits=hits, fragment_cache=fragment_cache)
+            expected_html = generate_html_email(digest, TOKEN_PLACEHOLDER, start_date, days, watchlist_hits=expected, compact=False)
+            if html_body != expected_html:
+                print(f"Full-mode HTML differs for preference set {number} over {days} day(s): {preferences}")
+                raise SystemExit(1)
+
+    print(f"{checked} watchlist checks over {len(preference_sets)} preference sets agree ({matched} with hits).")
+
+
+if __name__ == "__main__":
+    main()
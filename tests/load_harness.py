@@ -0,0 +1,311 @@
+"""
+Usage:
+    python tests/load_harness.py --users 5000
+
+Options:
+    python tests/load_harness.py --users 20000 --workers 16
+    python tests/load_harness.py --users 5000 --http-latency-ms 300 --http-error-rate 0.2
+    python tests/load_harness.py --users 5000 --smtp-latency-ms 40 --smtp-error-rate 0.05 --rate-per-minute 6000
+    python tests/load_harness.py --users 2000 --output load.json
+
+Runs the real send path (send_menu.run) offline against two local stand-ins:
+a Nutrislice replay server that serves the week fixtures in tests/fixtures/nutrislice
+with injected latency and errors, and an SMTP sink that accepts and counts messages.
+Users are synthetic (see benchmark_pipeline.build_users), so Supabase is not contacted.
+Prints throughput, sink counts and the run metrics summary.
+"""
+
+import argparse
+import datetime
+import hashlib
+import http.server
+import json
+import logging
+import os
+import random
+import re
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmark_pipeline import FIXTURES_DIR, build_users, load_fixture_weeks
+
+WEEK_PATH = re.compile(r"^/menu-type/(?P<meal>[a-z]+)/(?P<year>\d{4})/(?P<month>\d{2})/(?P<day>\d{2})/?$")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load-test send_menu.py against local Nutrislice and SMTP stand-ins.",
+    )
+    parser.add_argument("--users", type=int, default=5000, help="Synthetic users to send to")
+    parser.add_argument("--date", help="Send date in YYYY-MM-DD format (default: Monday of the first fixture week)")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES_DIR, help="Directory of Nutrislice week fixtures")
+    parser.add_argument("--workers", type=int, help="DELIVERY_WORKERS for the run (default: environment or 4)")
+    parser.add_argument("--rate-per-minute", type=int, default=0, help="SMTP_RATE_PER_MINUTE for the run (0 = unlimited)")
+    parser.add_argument("--http-latency-ms", type=float, default=50.0, help="Added latency per Nutrislice request")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Fraction of Nutrislice requests answered with 503")
+    parser.add_argument("--smtp-latency-ms", type=float, default=5.0, help="Added latency per accepted message")
+    parser.add_argument("--smtp-error-rate", type=float, default=0.0, help="Fraction of messages rejected with 451")
+    parser.add_argument("--warm-cache", action="store_true", help="Fill the menu snapshot cache before the timed run, so fetches revalidate (default: cold cache)")
+    parser.add_argument("--output", type=Path, help="Write the harness report as JSON to this path")
+    parser.add_argument("--verbose", action="store_true", help="Keep send_menu's per-user INFO logging")
+    return parser.parse_args()
+
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers /menu-type/<meal>/<yyyy>/<mm>/<dd>/ with the fixture week containing that date.
+    """
+
+    server: "NutrisliceReplayServer"
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.count("requests")
+        if server.latency_seconds:
+            time.sleep(server.latency_seconds * (0.5 + server.random()))
+
+        if server.random() < server.error_rate:
+            server.count("injected_errors")
+            self.send_error(503, "Injected failure")
+            return
+
+        match = WEEK_PATH.match(self.path)
+        if not match:
+            self.send_error(404)
+            return
+
+        date = datetime.date(int(match["year"]), int(match["month"]), int(match["day"]))
+        body, etag = server.week_body(match["meal"], date)
+        if self.headers.get("If-None-Match") == etag:
+            server.count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class NutrisliceReplayServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, weeks: Dict[str, Dict[str, Any]], latency_ms: float, error_rate: float):
+        super().__init__(("127.0.0.1", 0), ReplayHandler)
+        self.weeks = {datetime.date.fromisoformat(week): payloads for week, payloads in weeks.items()}
+        self.latency_seconds = latency_ms / 1000
+        self.error_rate = error_rate
+        self.stats: Dict[str, int] = {"requests": 0, "injected_errors": 0, "not_modified": 0}
+        self._random = random.Random(1)
+        self._lock = threading.Lock()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def week_body(self, meal: str, date: datetime.date) -> Tuple[bytes, str]:
+        week_start = date - datetime.timedelta(days=(date.weekday() + 1) % 7)
+        payload = self.weeks.get(week_start, {}).get(meal) or {"start_date": week_start.isoformat(), "days": []}
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/menu-type"
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal ESMTP dialogue: accepts any AUTH PLAIN login and counts each DATA payload.
+    """
+
+    server: "SMTPSink"
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self) -> None:
+        server = self.server
+        server.count("connections")
+        self.reply("220 localhost load-harness sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            verb = line.decode("ascii", "replace").strip().split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif verb == "AUTH":
+                server.count("logins")
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b".\r\n":
+                        break
+                    size += len(data_line)
+                if server.latency_seconds:
+                    time.sleep(server.latency_seconds)
+                if server.random() < server.error_rate:
+                    server.count("rejected")
+                    self.reply("451 4.3.0 Injected failure")
+                else:
+                    server.accept(size)
+                    self.reply("250 2.0.0 Queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency_ms: float, error_rate: float):
+        super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+        self.latency_seconds = latency_ms / 1000
+        self.error_rate = error_rate
+        self.stats: Dict[str, int] = {"connections": 0, "logins": 0, "messages": 0, "bytes": 0, "rejected": 0}
+        self._random = random.Random(2)
+        self._lock = threading.Lock()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def accept(self, size: int) -> None:
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats["bytes"] += size
+
+
+def start_in_background(server: socketserver.BaseServer, name: str) -> None:
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+
+
+def configure_environment(args: argparse.Namespace, replay: NutrisliceReplayServer, sink: SMTPSink, work_dir: Path) -> None:
+    os.environ["NUTRISLICE_BASE_URL"] = replay.base_url
+    os.environ["SMTP_SERVER"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(sink.server_address[1])
+    os.environ["SMTP_EMAIL"] = "menus@load-harness.local"
+    os.environ["SMTP_PASSWORD"] = "load-harness"
+    os.environ["SMTP_STARTTLS"] = "off"
+    os.environ["SMTP_RATE_PER_MINUTE"] = str(args.rate_per_minute)
+    os.environ["SMTP_DAILY_QUOTA"] = "0"
+    os.environ["MENU_CACHE_DIR"] = str(work_dir / "nutrislice")
+    os.environ["SEND_LEDGER_PATH"] = str(work_dir / "send_ledger.sqlite3")
+    # Keep fixture menus out of the real .cache: --update diffs and history queries read these.
+    os.environ["MENU_STATE_PATH"] = str(work_dir / "menu_state.sqlite3")
+    os.environ["MENU_ARTIFACT_DIR"] = str(work_dir / "menu_artifacts")
+    os.environ["MENU_ARCHIVE_PATH"] = "off"
+    if args.workers:
+        os.environ["DELIVERY_WORKERS"] = str(args.workers)
+
+
+def main() -> None:
+    args = parse_args()
+    weeks = load_fixture_weeks(args.fixtures)
+    if not weeks:
+        raise SystemExit(f"No fixtures found in {args.fixtures}")
+
+    send_date = args.date or (datetime.date.fromisoformat(min(weeks)) + datetime.timedelta(days=1)).isoformat()
+    menu_names = [
+        food["name"]
+        for payloads in weeks.values()
+        for payload in payloads.values()
+        for day in payload.get("days", [])
+        for item in day.get("menu_items", [])
+        if (food := item.get("food"))
+    ]
+    users = build_users(args.users, menu_names)
+
+    replay = NutrisliceReplayServer(weeks, args.http_latency_ms, args.http_error_rate)
+    sink = SMTPSink(args.smtp_latency_ms, args.smtp_error_rate)
+    start_in_background(replay, "nutrislice-replay")
+    start_in_background(sink, "smtp-sink")
+
+    with tempfile.TemporaryDirectory(prefix="load-harness-") as temp_dir:
+        configure_environment(args, replay, sink, Path(temp_dir))
+
+        # Imported after the environment is set so module-level settings pick it up.
+        import send_menu
+        from services.config import bootstrap
+        from services.metrics import start_run_metrics, write_run_metrics
+        from services.utils import prewarm_menu_weeks
+
+        if args.warm_cache:
+            start = datetime.date.fromisoformat(send_date)
+            prewarm_menu_weeks([start + datetime.timedelta(days=offset) for offset in range(send_menu.MAX_DAYS_AHEAD)])
+
+        bootstrap()
+        logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+        metrics = start_run_metrics()
+        started = time.perf_counter()
+        try:
+            send_menu.run(send_menu.parse_args(["--date", send_date]), metrics, users=users)
+        finally:
+            elapsed = time.perf_counter() - started
+            write_run_metrics(metrics)
+            replay.shutdown()
+            sink.shutdown()
+
+    summary = metrics.summary()
+    report = {
+        "users": args.users,
+        "send_date": send_date,
+        "elapsed_seconds": round(elapsed, 3),
+        "messages_per_second": round(sink.stats["messages"] / elapsed, 1) if elapsed else 0.0,
+        "nutrislice": replay.stats,
+        "smtp": sink.stats,
+        "run": summary,
+    }
+
+    print(f"Sent to {args.users} synthetic users for {send_date} in {elapsed:.2f}s")
+    print(f"  SMTP sink: {sink.stats['messages']} accepted ({sink.stats['bytes'] / 1024:.0f} KB), "
+          f"{sink.stats['rejected']} rejected, {sink.stats['connections']} connection(s)")
+    print(f"  Delivery stage: {summary['run'].get('sent', 0)} sent, {summary['run'].get('failed', 0)} failed, "
+          f"{summary['run'].get('skipped_by_quota', 0)} skipped by quota, {summary['run'].get('cohorts', 0)} cohort(s)")
+    print(f"  Throughput: {report['messages_per_second']} messages/s")
+    print(f"  Nutrislice replay: {replay.stats['requests']} request(s), "
+          f"{replay.stats['injected_errors']} injected error(s), {replay.stats['not_modified']} not modified")
+    for line in metrics.report_lines():
+        print(f"  {line}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,24 +17,20 @@ import sys
 from pathlib import Path
 from typing import List, Dict, Any
 
-from dotenv import load_dotenv
-
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
+from services.config import bootstrap
 from services.email_sender import send_email
 from services.email_templates import generate_html_email
 from services.utils import (
-    fetch_menu_data,
+    fetch_menu_range,
     find_watchlist_hits,
-    parse_menu,
     sort_menu_items,
 )
 
-load_dotenv()
-
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+bootstrap()
 
 
 def parse_args() -> argparse.Namespace:
@@ -120,13 +116,13 @@ def main() -> None:
     args = parse_args()
     start_date = get_start_date(args.date)
 
+    end_date = start_date + datetime.timedelta(days=args.days - 1)
+    logging.info("Fetching menu for %s to %s...", start_date, end_date)
+    menu_by_date = fetch_menu_range(start_date, end_date)
+
     all_items: List[Dict[str, Any]] = []
-    for offset in range(args.days):
-        target_date = start_date + datetime.timedelta(days=offset)
-        logging.info("Fetching menu for %s...", target_date)
-        raw_menu = fetch_menu_data(target_date)
-        parsed_items = parse_menu(raw_menu, target_date=target_date)
-        all_items.extend(parsed_items)
+    for target_date in sorted(menu_by_date):
+        all_items.extend(menu_by_date[target_date])
 
     filtered_items = sort_menu_items(filter_preview_items(all_items, args.meals, args.stations))
     watchlist_terms = normalize_watchlist_terms(args.watchlist)
@@ -6,6 +6,10 @@ Examples:
     python tests/test_watchlist_hits.py --date 2026-04-13 --watchlist "cuban pork"
     python tests/test_watchlist_hits.py --date 2026-04-13 --days 2 --meal lunch --watchlist "cookie"
     python tests/test_watchlist_hits.py --meal lunch --meal dinner --watchlist "ramen" --watchlist "chicken tender"
+    python tests/test_watchlist_hits.py --archive --days 14 --watchlist "cuban pork"
+
+--archive answers from the local menu archive (python -m services.menu_archive) without
+network access, allows any --days, and also prints when each term was last and next served.
 """
 
 import argparse
@@ -18,7 +22,8 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-from services.utils import fetch_menu_data, find_watchlist_hits, parse_menu
+from services.menu_archive import MenuArchive, get_archive_path
+from services.utils import fetch_menu_range, find_watchlist_hits
 
 
 def parse_args() -> argparse.Namespace:
@@ -32,9 +37,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--days",
         type=int,
-        choices=[1, 2],
         default=1,
-        help="How many days to scan",
+        help="How many days to scan (1 or 2 unless --archive is set)",
     )
     parser.add_argument(
         "--meal",
@@ -49,7 +53,15 @@ def parse_args() -> argparse.Namespace:
         required=True,
         help="Saved item term to test. Repeat for multiple terms.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Search the local menu archive instead of fetching from Nutrislice",
+    )
+    args = parser.parse_args()
+    if args.days < 1 or (not args.archive and args.days > 2):
+        parser.error("--days must be 1 or 2, or any positive number with --archive")
+    return args
 
 
 def get_start_date(date_arg: str | None) -> datetime.date:
@@ -91,19 +103,31 @@ def main() -> None:
     start_date = get_start_date(args.date)
     watchlist = normalize_watchlist_terms(args.watchlist)
 
-    all_items: List[Dict[str, Any]] = []
-    for offset in range(args.days):
-        target_date = start_date + datetime.timedelta(days=offset)
-        raw_menu = fetch_menu_data(target_date)
-        all_items.extend(parse_menu(raw_menu, target_date=target_date))
-
-    hits = find_watchlist_hits(
-        all_items,
-        {
-            "meals": args.meals or [],
-            "watchlist": watchlist,
-        },
-    )
+    end_date = start_date + datetime.timedelta(days=args.days - 1)
+    preferences = {
+        "meals": args.meals or [],
+        "watchlist": watchlist,
+    }
+
+    if args.archive:
+        archive_path = get_archive_path()
+        if archive_path is None or not archive_path.exists():
+            raise SystemExit("No local menu archive; run python -m services.menu_archive --from YYYY-MM-DD first.")
+        with MenuArchive(archive_path) as archive:
+            hits = archive.find_watchlist_hits(preferences, start_date, end_date)
+            history = {
+                term: (archive.last_served(term, start_date, args.meals), archive.next_served(term, start_date, args.meals))
+                for term in watchlist
+            }
+    else:
+        menu_by_date = fetch_menu_range(start_date, end_date)
+
+        all_items: List[Dict[str, Any]] = []
+        for target_date in sorted(menu_by_date):
+            all_items.extend(menu_by_date[target_date])
+
+        hits = find_watchlist_hits(all_items, preferences)
+        history = {}
 
     print(f"Start date: {start_date.isoformat()}")
     print(f"Days: {args.days}")
@@ -111,6 +135,11 @@ def main() -> None:
     print(f"Watchlist: {', '.join(watchlist)}")
     print(f"Hits: {len(hits)}")
 
+    for term, (last_served, next_served) in history.items():
+        last_date = last_served[0].date if last_served else "never"
+        next_date = next_served[0].date if next_served else "not scheduled"
+        print(f"{term}: last served {last_date}, next served {next_date}")
+
     if not hits:
         return
 
@@ -6,6 +6,11 @@ import type { Meal, MenuFoodIcon, MenuItem, NutritionInfo, ServingSizeInfo } fro
 const MENU_BASE_URL =
   "https://dickinson.api.nutrislice.com/menu/api/weeks/school/the-caf/menu-type";
 const MENU_REVALIDATE_SECONDS = 60 * 30;
+// Written by `python -m services.menu_artifact`; bump together with ARTIFACT_VERSION there.
+const MENU_ARTIFACT_VERSION = 1;
+// .github/workflows/menu_artifacts.yml rebuilds artifacts every 30 minutes; one older than
+// this means builds stopped (or skipped the week), so Nutrislice is fetched instead.
+const DEFAULT_MENU_ARTIFACT_MAX_AGE_SECONDS = 2 * 60 * 60;
 
 type NutrisliceDay = {
   date?: string;
@@ -42,6 +47,28 @@ type NutrisliceFood = {
   } | null;
 };
 
+type MenuArtifactItem = {
+  name: string;
+  calories?: number;
+  nutritionInfo?: Partial<NutritionInfo>;
+  ingredients?: string;
+  icons?: MenuFoodIcon[];
+  servingSize?: ServingSizeInfo;
+};
+
+type MenuArtifact = {
+  version?: number;
+  week_start?: string;
+  generated_at?: number;
+  days?: Record<
+    string,
+    Array<{
+      meal: Meal;
+      stations: Array<{ station: string; items: MenuArtifactItem[] }>;
+    }>
+  >;
+};
+
 export type GroupedStationMenu = {
   station: string;
   items: MenuItem[];
@@ -68,6 +95,12 @@ function toIsoDate(date: Date): string {
   )}`;
 }
 
+function getWeekStartIsoDate(isoDate: string): string {
+  const date = new Date(`${isoDate}T00:00:00`);
+  date.setDate(date.getDate() - date.getDay());
+  return toIsoDate(date);
+}
+
 function normalizeStationKey(value: string): string {
   return value.toLowerCase().replace(/[^a-z0-9]/g, "");
 }
@@ -291,12 +324,89 @@ function groupMenuItems(items: MenuItem[]): GroupedMealMenu[] {
   }).filter((mealGroup) => mealGroup.stations.length > 0);
 }
 
+function toArtifactNutritionInfo(
+  nutrition: Partial<NutritionInfo> | undefined,
+): NutritionInfo | null {
+  if (!nutrition) {
+    return null;
+  }
+
+  return normalizeNutritionInfo({ rounded_nutrition_info: nutrition });
+}
+
+function getArtifactMaxAgeSeconds(): number {
+  const raw = process.env.MENU_ARTIFACT_MAX_AGE_SECONDS?.trim();
+  const configured = raw ? Number(raw) : Number.NaN;
+  return Number.isFinite(configured) && configured >= 0
+    ? configured
+    : DEFAULT_MENU_ARTIFACT_MAX_AGE_SECONDS;
+}
+
+function isArtifactFresh(artifact: MenuArtifact): boolean {
+  const ageSeconds = Date.now() / 1000 - (artifact.generated_at ?? 0);
+  return ageSeconds < getArtifactMaxAgeSeconds();
+}
+
+async function fetchArtifactMenuForIsoDate(
+  isoDate: string,
+): Promise<GroupedMealMenu[] | null> {
+  const artifactBaseUrl = process.env.MENU_ARTIFACT_URL?.replace(/\/+$/, "");
+  if (!artifactBaseUrl) {
+    return null;
+  }
+
+  try {
+    const response = await fetch(
+      `${artifactBaseUrl}/menu-week-${getWeekStartIsoDate(isoDate)}.json`,
+      { cache: "no-store" },
+    );
+    if (!response.ok) {
+      return null;
+    }
+
+    const artifact = (await response.json()) as MenuArtifact;
+    if (
+      artifact.version !== MENU_ARTIFACT_VERSION ||
+      !artifact.days ||
+      !isArtifactFresh(artifact)
+    ) {
+      return null;
+    }
+
+    // The artifact is already sorted and grouped; only MenuItem defaults are filled in.
+    return (artifact.days[isoDate] ?? []).map(({ meal, stations }) => ({
+      meal,
+      stations: stations.map(({ station, items }) => ({
+        station,
+        items: items.map((item) => ({
+          date: isoDate,
+          meal,
+          station,
+          name: item.name,
+          calories: item.calories ?? null,
+          nutritionInfo: toArtifactNutritionInfo(item.nutritionInfo),
+          ingredients: item.ingredients ?? null,
+          icons: item.icons ?? [],
+          servingSize: item.servingSize ?? null,
+        })),
+      })),
+    }));
+  } catch {
+    return null;
+  }
+}
+
 const fetchGroupedMenuForIsoDateCached = unstable_cache(
   async (isoDate: string) => {
+    const artifactMenu = await fetchArtifactMenuForIsoDate(isoDate);
+    if (artifactMenu) {
+      return artifactMenu;
+    }
+
     const items = await fetchRawMenuForIsoDate(isoDate);
     return groupMenuItems(items);
   },
-  ["grouped-menu-by-date-v2"],
+  ["grouped-menu-by-date-v3"],
   {
     revalidate: MENU_REVALIDATE_SECONDS,
   },